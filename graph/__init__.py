@@ -1,7 +1,10 @@
-from collections import defaultdict
+from array import array
+import os
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 from functools import lru_cache
 from heapq import heappop, heappush
-from itertools import combinations
+from itertools import combinations, count
 
 from graph.visuals import plot_3d
 
@@ -12,6 +15,7 @@ The graph-theory library is organised in the following way for clarity of struct
 2. All methods for class Graph in same order as on Graph.
 3. Graph (class)
 4. Graph3D (class) 
+5. FrozenGraph (class) - immutable snapshot returned by Graph.freeze()
 
 """
 
@@ -31,7 +35,11 @@ class BasicGraph(object):
         """
         self._nodes = {}
         self._edges = {}
+        self._reverse_edges = {}  # n2: {n1: value}, maintained by add_edge, del_edge & del_node.
         self._max_edge_value = 0
+        self._version = 0  # incremented on every change, so that derived indices can detect mutation.
+        self._track_components = False  # see track_components.
+        self._disjoint_set = None
 
         if from_dict is not None:
             self.from_dict(from_dict)
@@ -65,20 +73,26 @@ class BasicGraph(object):
         """
         if isinstance(value, (dict, list, tuple)):
             raise ValueError("value cannot be {}".format(type(value)))
+        self._version += 1
         if node1 not in self._nodes:
             self.add_node(node1)
         if node2 not in self._nodes:
             self.add_node(node2)
 
-        if node1 not in self._edges:
-            self._edges[node1] = {}
-        if node2 not in self._edges:
-            self._edges[node2] = {}
+        for n in (node1, node2):
+            if n not in self._edges:
+                self._edges[n] = {}
+            if n not in self._reverse_edges:
+                self._reverse_edges[n] = {}
         self._edges[node1][node2] = value
+        self._reverse_edges[node2][node1] = value
+        if self._disjoint_set is not None:
+            self._disjoint_set.union(node1, node2)
         if value > self._max_edge_value:
             self._max_edge_value = value
         if bidirectional:
             self._edges[node2][node1] = value
+            self._reverse_edges[node1][node2] = value
 
     def edge(self, node1, node2, default=None):
         """Retrieves the edge (node1, node2)
@@ -102,6 +116,9 @@ class BasicGraph(object):
         :param node2: node
         """
         del self._edges[node1][node2]
+        del self._reverse_edges[node2][node1]
+        self._disjoint_set = None  # a disjoint set can't split, so it's rebuilt on demand.
+        self._version += 1
 
     def add_node(self, node_id, obj=None):
         """
@@ -112,6 +129,9 @@ class BasicGraph(object):
 
         """
         self._nodes[node_id] = obj
+        if self._disjoint_set is not None:
+            self._disjoint_set.add(node_id)
+        self._version += 1
 
     def node(self, node_id):
         """
@@ -132,15 +152,26 @@ class BasicGraph(object):
             del self._nodes[node_id]
         except KeyError:
             pass
-        try:
-            del self._edges[node_id]
-        except KeyError:
-            pass
-        in_links = [n1 for n1, n2, d in self.edges() if n2 == node_id]
-        for inlink in in_links:
-            del self._edges[inlink][node_id]
+        for n2 in self._edges.pop(node_id, {}):
+            del self._reverse_edges[n2][node_id]
+        for n1 in self._reverse_edges.pop(node_id, {}):
+            del self._edges[n1][node_id]
+        self._disjoint_set = None
+        self._version += 1
         return None
 
+    def track_components(self, enabled=True):
+        """ Keeps a disjoint set of the (weakly connected) components up to
+        date as nodes and edges are added, so that components() and
+        same_component(n1, n2) need no search. Deleting nodes or edges
+        discards the disjoint set, which is then rebuilt on the next query.
+
+        :param enabled: bool
+        """
+        self._track_components = bool(enabled)
+        if not enabled:
+            self._disjoint_set = None
+
     def nodes(self,
               from_node=None, to_node=None,
               in_degree=None, out_degree=None):
@@ -171,25 +202,33 @@ class BasicGraph(object):
             return []
 
         if to_node is not None:
-            return [n1 for n1 in self._edges for n2 in self._edges[n1] if n2 == to_node]
+            if self._reverse_edges.get(to_node, None) is not None:
+                return [n1 for n1 in self._reverse_edges[to_node]]
+            return []
 
         if in_degree is not None:
             if not isinstance(in_degree, int) or in_degree < 0:
                 raise ValueError("in_degree must be int >= 0")
-
-            rev = {n: set() for n in self._nodes}
-            for n1, n2, d in self.edges():
-                rev[n2].add(n1)
-            return [n for n, n_set in rev.items() if len(n_set) == in_degree]
+            return [n for n in self._nodes if self.in_degree(n) == in_degree]
 
         if out_degree is not None:
             if not isinstance(out_degree, int) or out_degree < 0:
                 raise ValueError("out_degree must be int >= 0")
+            return [n for n in self._nodes if self.out_degree(n) == out_degree]
 
-            rev = {n: set() for n in self._nodes}
-            for n1, n2, d in self.edges():
-                rev[n1].add(n2)
-            return [n for n, n_set in rev.items() if len(n_set) == out_degree]
+    def in_degree(self, node):
+        """
+        :param node: node id
+        :return: number of edges into node.
+        """
+        return len(self._reverse_edges.get(node, ()))
+
+    def out_degree(self, node):
+        """
+        :param node: node id
+        :return: number of edges from node.
+        """
+        return len(self._edges.get(node, ()))
 
     def edges(self, path=None, from_node=None, to_node=None):
         """
@@ -224,10 +263,10 @@ class BasicGraph(object):
                 return []
 
         if to_node:
-            return [(n1, n2, self._edges[n1][n2])
-                    for n1 in self._edges
-                    for n2 in self._edges[n1]
-                    if n2 == to_node]
+            if to_node in self._reverse_edges:
+                return [(n1, to_node, d) for n1, d in self._reverse_edges[to_node].items()]
+            else:
+                return []
 
         return [(n1, n2, self._edges[n1][n2]) for n1 in self._edges for n2 in self._edges[n1]]
 
@@ -295,100 +334,590 @@ class BasicGraph(object):
         """ returns list of edges and nodes."""
         return self.edges() + [(i,) for i in self.nodes()]
 
-    @lru_cache(maxsize=128)
     def is_connected(self, n1, n2):
         """ helper determining if two nodes are connected using BFS. """
-        q = [n1]
-        visited = set()
+        q = deque([n1])
+        visited = {n1}
         while q:
-            n = q.pop(0)
-            if n not in visited:
-                visited.add(n)
-            for c in self._edges[n]:
+            n = q.popleft()
+            for c in self._edges.get(n, {}):
                 if c == n2:
                     return True  # <-- Exit if connected.
-                if c in visited:
-                    continue
-                else:
+                if c not in visited:
+                    visited.add(c)
                     q.append(c)
         return False  # <-- Exit if not connected.
 
 
 # Graph functions
 # -----------------------------
-def shortest_path(graph, start, end):
+def shortest_path(graph, start, end, weights=None):
     """
     :param graph: class Graph
     :param start: start node
     :param end: end node
+    :param weights: None or 'int'. Use 'int' for graphs where all edge values
+                    are small non-negative ints, such as hop counts or
+                    minutes. The search then uses a bucket queue instead of a
+                    heap. Raises ValueError if another edge value is found.
     :return: distance, path (as list),
              returns float('inf'), [] if no path exists.
     """
-    g = defaultdict(list)
-    for n1, n2, dist in graph.edges():
-        g[n1].append((dist, n2))
+    if weights is None:
+        return _shortest_path(graph._edges, start, end)
+    if weights == 'int':
+        return _shortest_path_buckets(graph._edges, start, end)
+    raise ValueError(f"expected weights to be None or 'int', not {weights}")
+
 
-    q, visited, mins = [(0, start, ())], set(), {start: 0}
+def _shortest_path(edges, start, end, excluded=(), excluded_hops=()):
+    """ Dijkstra search for shortest_path and k_shortest_paths.
+    :param edges: dict {n1: {n2: distance}}
+    :param start: start node
+    :param end: end node
+    :param excluded: nodes that may not be on the path.
+    :param excluded_hops: nodes that may not follow directly after start.
+    :return: distance, path (as list)
+    """
+    if start == end:
+        return 0, [start]
+    visited, mins, parents = set(excluded), {start: 0}, {start: None}
+    visited.add(start)
+    q = []
+    for v2, dist in edges.get(start, {}).items():
+        if v2 not in visited and v2 not in excluded_hops:
+            mins[v2] = dist
+            parents[v2] = start
+            heappush(q, (dist, v2))
     while q:
-        (cost, v1, path) = heappop(q)
-        if v1 not in visited:
+        (cost, v1) = heappop(q)
+        if v1 in visited:
+            continue
+        visited.add(v1)
+
+        if v1 == end:  # exit criteria.
+            return cost, _path_from_parents(parents, end)
+
+        for v2, dist in edges.get(v1, {}).items():
+            if v2 in visited:
+                continue
+            prev = mins.get(v2, None)
+            next_node = cost + dist
+            if prev is None or next_node < prev:
+                mins[v2] = next_node
+                parents[v2] = v1
+                heappush(q, (next_node, v2))
+    return float("inf"), []
+
+
+def _shortest_path_buckets(edges, start, end, neighbours=None):
+    """ Dijkstra search using a bucket queue (Dial's algorithm).
+
+    With integer edge values, the queue can be a bucket of nodes per
+    distance. The buckets are emptied in order of distance, which replaces
+    the log(n) cost of each heap operation by a scan over the distances,
+    whereby the search costs O(edges + max distance).
+
+    :param edges: dict {n1: {n2: distance}}, with distances as ints >= 0.
+    :param start: start node
+    :param end: end node
+    :param neighbours: None or function(n1) -> iterable of (n2, distance),
+                       used instead of edges (FrozenGraph uses this).
+    :return: distance, path (as list)
+    """
+    if neighbours is None:
+        def neighbours(n):
+            return edges.get(n, {}).items()
+    visited, mins, parents = set(), {start: 0}, {start: None}
+    buckets = {0: [start]}  # distance: [nodes]
+    pending = 1  # number of nodes in the buckets.
+    cost = 0
+    while pending:
+        bucket = buckets.pop(cost, None)
+        if bucket is None:
+            cost += 1
+            continue
+        pending -= len(bucket)
+        for v1 in bucket:
+            if v1 in visited:
+                continue
             visited.add(v1)
-            path = (v1, path)
 
             if v1 == end:  # exit criteria.
-                L = []
-                while path:
-                    v, path = path[0], path[1]
-                    L.append(v)
-                L.reverse()
-                return cost, L
-
-            for dist, v2 in g.get(v1, ()):
+                return cost, _path_from_parents(parents, end)
+
+            for v2, dist in neighbours(v1):
                 if v2 in visited:
                     continue
-                prev = mins.get(v2, None)
+                if not isinstance(dist, int) or isinstance(dist, bool) or dist < 0:
+                    raise ValueError(f"edge ({v1}, {v2}) has value {dist}, which isn't an int >= 0")
                 next_node = cost + dist
+                prev = mins.get(v2, None)
                 if prev is None or next_node < prev:
                     mins[v2] = next_node
-                    heappush(q, (next_node, v2, path))
+                    parents[v2] = v1
+                    if next_node in buckets:
+                        buckets[next_node].append(v2)
+                    else:
+                        buckets[next_node] = [v2]
+                    pending += 1
+    return float("inf"), []
+
+
+def k_shortest_paths(graph, start, end, k):
+    """ Determines the k shortest paths without repeated nodes from start to
+    end, using Yen's algorithm.
+
+    Each path found is the parent of new candidates: for every node on the
+    path (the spur node) the path up to that node (the root) is extended with
+    the shortest path from the spur node that avoids the root and the next
+    hops used by the paths found earlier with the same root. A root with the
+    same next hops excluded is only searched once.
+
+    :param graph: class Graph
+    :param start: start node
+    :param end: end node
+    :param k: int: number of paths.
+    :return: list of (distance, path), shortest first. The list is shorter
+             than k if there are fewer paths.
+    """
+    if not isinstance(k, int) or k < 1:
+        raise ValueError(f"expected k to be int >= 1, not {k}")
+    edges = graph._edges
+    distance, path = _shortest_path(edges, start, end)
+    if not path:
+        return []
+    found = [(distance, path)]
+    known = {tuple(path)}
+    candidates = []  # heap of (distance, counter, path)
+    searched = set()  # (root, excluded hops) of the spur searches done.
+    counter = 0
+    while len(found) < k:
+        _, last = found[-1]
+        root_distance = 0
+        for i, spur in enumerate(last[:-1]):
+            if i:
+                root_distance += edges[last[i - 1]][spur]
+            root = tuple(last[:i + 1])
+            hops = frozenset(p[i + 1] for _, p in found if len(p) > i + 1 and tuple(p[:i + 1]) == root)
+            if (root, hops) in searched:
+                continue
+            searched.add((root, hops))
+
+            distance, spur_path = _shortest_path(edges, spur, end, excluded=root[:-1], excluded_hops=hops)
+            if not spur_path:
+                continue
+            path = list(root[:-1]) + spur_path
+            if tuple(path) in known:
+                continue
+            known.add(tuple(path))
+            counter += 1
+            heappush(candidates, (root_distance + distance, counter, path))
+
+        if not candidates:
+            break
+        distance, _, path = heappop(candidates)
+        found.append((distance, path))
+    return found
+
+
+def shortest_path_tree(graph, start, cutoff=None, targets=None):
+    """ Determines the shortest paths from start to all other nodes.
+
+    :param graph: class Graph
+    :param start: start node
+    :param cutoff: (optional) the search stops at nodes further away than cutoff.
+    :param targets: (optional) iterable of nodes. The search stops when all
+                    targets have been reached.
+    :return: ShortestPathTree with distances and parents of the nodes reached.
+    """
+    edges = graph._edges
+    remaining = None if targets is None else set(targets)
+    q, mins, parents = [(0, start)], {start: 0}, {start: None}
+    distances, tree = {}, {}
+    while q:
+        (cost, v1) = heappop(q)
+        if v1 in distances:
+            continue
+        if cutoff is not None and cost > cutoff:
+            break
+        distances[v1] = cost
+        tree[v1] = parents[v1]
+
+        if remaining is not None:
+            remaining.discard(v1)
+            if not remaining:
+                break
+
+        for v2, dist in edges.get(v1, {}).items():
+            if v2 in distances:
+                continue
+            prev = mins.get(v2, None)
+            next_node = cost + dist
+            if prev is None or next_node < prev:
+                mins[v2] = next_node
+                parents[v2] = v1
+                heappush(q, (next_node, v2))
+    return ShortestPathTree(start, distances, tree)
+
+
+class ShortestPathTree(object):
+    """ The result of a single source shortest path search.
+
+    distances: dict {node: distance from start}
+    parents: dict {node: previous node on the shortest path from start}
+
+    Paths are only rebuilt when asked for, using `path(node)`.
+    """
+
+    def __init__(self, start, distances, parents):
+        self.start = start
+        self.distances = distances
+        self.parents = parents
+
+    def __contains__(self, item):
+        """
+        :returns bool: True if node was reached.
+        """
+        return item in self.distances
+
+    def distance(self, node):
+        """
+        :param node: node
+        :return: distance from start, or float('inf') if node wasn't reached.
+        """
+        return self.distances.get(node, float('inf'))
+
+    def path(self, node):
+        """
+        :param node: node
+        :return: path from start to node as list, or [] if node wasn't reached.
+        """
+        if node not in self.distances:
+            return []
+        return _path_from_parents(self.parents, node)
+
+
+def shortest_path_bidirectional(graph, start, end):
+    """ Determines the shortest path by searching forward from `start` and
+    backward from `end` at the same time, until the two searches meet.
+
+    For point-to-point queries this settles far fewer nodes than
+    shortest_path, as each search only covers about half the distance.
+
+    :param graph: class Graph
+    :param start: start node
+    :param end: end node
+    :return: distance, path (as list),
+             returns float('inf'), [] if no path exists.
+    """
+    if start == end:
+        return 0, [start]
+    adjacency = (graph._edges, graph._reverse_edges)
+    queues = ([(0, start)], [(0, end)])
+    mins = ({start: 0}, {end: 0})
+    parents = ({start: None}, {end: None})
+    visited = (set(), set())
+
+    best, meeting_point = float('inf'), None
+    while queues[0] and queues[1]:
+        if queues[0][0][0] + queues[1][0][0] >= best:
+            break  # no path through the unsettled nodes can be shorter.
+
+        side = 0 if len(queues[0]) <= len(queues[1]) else 1  # expand the smallest frontier.
+        other = 1 - side
+        (cost, v1) = heappop(queues[side])
+        if v1 in visited[side]:
+            continue
+        visited[side].add(v1)
+
+        for v2, dist in adjacency[side].get(v1, {}).items():
+            if v2 in visited[side]:
+                continue
+            prev = mins[side].get(v2, None)
+            next_node = cost + dist
+            if prev is None or next_node < prev:
+                mins[side][v2] = next_node
+                parents[side][v2] = v1
+                heappush(queues[side], (next_node, v2))
+            if v2 in mins[other] and mins[side][v2] + mins[other][v2] < best:
+                best = mins[side][v2] + mins[other][v2]
+                meeting_point = v2
+
+    if meeting_point is None:
+        return float("inf"), []
+    path = _path_from_parents(parents[0], meeting_point)
+    v = parents[1][meeting_point]
+    while v is not None:
+        path.append(v)
+        v = parents[1][v]
+    return best, path
+
+
+def a_star_search(graph, start, end, heuristic):
+    """ Determines the shortest path using A*, which expands the nodes in
+    order of (distance from start + estimated distance to end).
+
+    :param graph: class Graph
+    :param start: start node
+    :param end: end node
+    :param heuristic: callable, heuristic(node) returns the estimated
+                      distance from node to end. The estimate must never
+                      exceed the real distance, or the path returned may
+                      not be the shortest.
+    :return: distance, path (as list),
+             returns float('inf'), [] if no path exists.
+    """
+    if not callable(heuristic):
+        raise TypeError(f"Expected {heuristic} to be callable")
+    edges = graph._edges
+    estimates = {start: heuristic(start)}
+    # ties are broken by the smallest estimate, i.e. the node closest to end.
+    q, visited, mins, parents = [(estimates[start], estimates[start], 0, start)], set(), {start: 0}, {start: None}
+    while q:
+        (_, _, cost, v1) = heappop(q)
+        if v1 in visited:
+            continue
+        visited.add(v1)
+
+        if v1 == end:  # exit criteria.
+            return cost, _path_from_parents(parents, end)
+
+        for v2, dist in edges.get(v1, {}).items():
+            if v2 in visited:
+                continue
+            prev = mins.get(v2, None)
+            next_node = cost + dist
+            if prev is None or next_node < prev:
+                mins[v2] = next_node
+                parents[v2] = v1
+                if v2 not in estimates:
+                    estimates[v2] = heuristic(v2)
+                heappush(q, (next_node + estimates[v2], estimates[v2], next_node, v2))
     return float("inf"), []
 
 
+def _path_from_parents(parents, end):
+    """ rebuilds the path to `end` from a map of node: parent node. """
+    path = []
+    v = end
+    while v is not None:
+        path.append(v)
+        v = parents[v]
+    path.reverse()
+    return path
+
+
+def shortest_paths_many(graph, pairs, workers=None):
+    """ Determines the shortest paths for many (start, end) pairs.
+
+    The pairs are grouped by start node, so that one search per start node
+    serves all its end nodes. The searches are spread over a pool of
+    processes, which each receive a compact copy (FrozenGraph) of the
+    graph once.
+
+    :param graph: class Graph
+    :param pairs: list of (start, end)
+    :param workers: int: number of processes. None uses all cores.
+                    1 runs all searches in this process.
+    :return: list of (distance, path) in the same order as pairs.
+    """
+    if workers is not None and (not isinstance(workers, int) or workers < 1):
+        raise ValueError(f"expected workers to be int >= 1, not {workers}")
+    frozen = graph if isinstance(graph, FrozenGraph) else FrozenGraph(graph)
+    index = frozen._index
+
+    results = [(float('inf'), []) for _ in pairs]
+    tasks = defaultdict(list)  # start: [(position in pairs, end)]
+    for ix, (start, end) in enumerate(pairs):
+        if start in index and end in index:
+            tasks[index[start]].append((ix, index[end]))
+    tasks = list(tasks.items())
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1 or len(tasks) < 2:
+        batches = [_paths_from_source(task, frozen) for task in tasks]
+    else:
+        chunksize = max(1, len(tasks) // (workers * 4))
+        with _worker_pool(workers, frozen) as pool:
+            batches = list(pool.map(_paths_from_source, tasks, chunksize=chunksize))
+
+    for batch in batches:
+        for ix, d, path in batch:
+            results[ix] = (d, path)
+    return results
+
+
+_worker = ()  # state of a worker process of _worker_pool.
+
+
+def _worker_pool(workers, *state):
+    """ Creates a pool of processes, which each receive `state` (such as a
+    FrozenGraph) once, instead of with every task.
+    :param workers: int: number of processes, None uses all cores.
+    :param state: picklable objects, see _worker_state.
+    :return: ProcessPoolExecutor
+    """
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=state)
+
+
+def _init_worker(*state):
+    global _worker
+    _worker = state
+
+
+def _worker_state():
+    """ returns the state given to _worker_pool, in a worker process. """
+    return _worker
+
+
+def _paths_from_source(task, frozen=None):
+    """ runs one search for all ends of a start node.
+    :param task: start index, [(position, end index), ...]
+    :param frozen: FrozenGraph, defaults to the graph of the worker process.
+    :return: list of (position, distance, path)
+    """
+    start, ends = task
+    if frozen is None:
+        frozen, = _worker_state()
+    distances, parents = frozen._dijkstra(start, targets={end for _, end in ends})
+    results = []
+    for ix, end in ends:
+        d = distances[end]
+        if d == float('inf'):
+            results.append((ix, d, []))
+            continue
+        path = []
+        v = end
+        while v != -1:
+            path.append(frozen._node_ids[v])
+            v = parents[v]
+        path.reverse()
+        results.append((ix, frozen._value(d), path))
+    return results
+
+
 def breadth_first_search(graph, start, end):
     """ Determines the path from start to end with fewest nodes.
     :param graph: class Graph
     :param start: start node
     :param end: end node
-    :return: path
+    :return: number of edges, path
     """
-    g = defaultdict(list)
-    for n1, n2, dist in graph.edges():
-        g[n1].append((dist, n2))
-
-    q, visited, mins = [(0, start, ())], set(), {start: 0}
+    if start == end:
+        return 0, [start]
+    edges = graph._edges
+    q, parents = deque([start]), {start: None}
     while q:
-        (cost, v1, path) = heappop(q)
-        if v1 not in visited:
-            visited.add(v1)
-            path = (v1, path)
+        v1 = q.popleft()
+        for v2 in edges.get(v1, {}):
+            if v2 in parents:
+                continue
+            parents[v2] = v1
+            if v2 == end:  # exit criteria.
+                path = _path_from_parents(parents, end)
+                return len(path) - 1, path  # <-- exit if end is found.
+            q.append(v2)
+    return float("inf"), []  # <-- exit if end is not found.
 
-            if v1 == end:  # exit criteria.
-                L = []
-                while path:
-                    v, path = path[0], path[1]
-                    L.append(v)
-                L.reverse()
-                return cost, L  # <-- exit if end is found.
-
-            for dist, v2 in g.get(v1, ()):
-                if v2 in visited:
+
+def breadth_first_search_bidirectional(graph, start, end):
+    """ Determines the path from start to end with fewest nodes by searching
+    forward from start and backward from end, one level at a time, always
+    expanding the smallest frontier.
+
+    On graphs with low diameter and high degree (social networks) the two
+    searches meet after exploring a tiny fraction of the nodes that a single
+    breadth first search would explore.
+
+    :param graph: class Graph
+    :param start: start node
+    :param end: end node
+    :return: number of edges, path
+    """
+    if start == end:
+        return 0, [start]
+    adjacency = (graph._edges, graph._reverse_edges)
+    parents = ({start: None}, {end: None})
+    depths = ({start: 0}, {end: 0})
+    frontiers = ([start], [end])
+
+    while frontiers[0] and frontiers[1]:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        other = 1 - side
+        new_frontier, best, meeting_point = [], float('inf'), None
+        for v1 in frontiers[side]:
+            for v2 in adjacency[side].get(v1, {}):
+                if v2 in parents[side]:
                     continue
-                prev = mins.get(v2, None)
-                next_node = cost + 1
-                if prev is None or next_node < prev:
-                    mins[v2] = next_node
-                    heappush(q, (next_node, v2, path))
-    return float("inf"), []  # <-- exit if end is not found.
+                parents[side][v2] = v1
+                depths[side][v2] = depths[side][v1] + 1
+                new_frontier.append(v2)
+                if v2 in depths[other] and depths[side][v2] + depths[other][v2] < best:
+                    best, meeting_point = depths[side][v2] + depths[other][v2], v2
+        if meeting_point is not None:
+            path = _path_from_parents(parents[0], meeting_point)
+            v = parents[1][meeting_point]
+            while v is not None:
+                path.append(v)
+                v = parents[1][v]
+            return best, path
+        if side == 0:
+            frontiers = (new_frontier, frontiers[1])
+        else:
+            frontiers = (frontiers[0], new_frontier)
+    return float("inf"), []
+
+
+def dfs_events(graph, start, expand=None, visited=None):
+    """ Generator that traverses the descendants of `start` depth first, and
+    yields the events of the search as tuples (event, n1, n2):
+
+        ("discover", n1, n2)  - n2 is reached for the first time, from n1.
+        ("finish", n1, n2)    - all descendants of n2 (reached from n1) are done.
+        ("back_edge", n1, n2) - the edge n1 -> n2 leads back to a node on the
+                                current path, i.e. it closes a cycle.
+
+    For `start`, n1 is None. The search keeps a stack of neighbour iterators,
+    so each edge is looked at once and backtracking is O(1).
+
+    :param graph: class Graph
+    :param start: start node
+    :param expand: (optional) callable, expand(node) returns False if the search
+                   should not continue beyond node. Called once per discovered node.
+    :param visited: (optional) set of nodes to skip. It is updated in place,
+                    so it can be shared between searches from several nodes.
+    :return: generator of (event, n1, n2)
+    """
+    edges = graph._edges
+    if visited is None:
+        visited = set()
+    visited.add(start)
+    yield "discover", None, start
+    if expand is not None and not expand(start):
+        yield "finish", None, start
+        return
+
+    on_path = {start}
+    stack = [(start, iter(edges.get(start, {})))]
+    while stack:
+        n1, children = stack[-1]
+        for n2 in children:
+            if n2 in on_path:
+                yield "back_edge", n1, n2
+            elif n2 not in visited:
+                visited.add(n2)
+                yield "discover", n1, n2
+                if expand is None or expand(n2):
+                    on_path.add(n2)
+                    stack.append((n2, iter(edges.get(n2, {}))))
+                    break
+                yield "finish", n1, n2
+        else:
+            stack.pop()
+            on_path.discard(n1)
+            yield "finish", stack[-1][0] if stack else None, n1
 
 
 def depth_first_search(graph, start, end):
@@ -406,30 +935,14 @@ def depth_first_search(graph, start, end):
     if end not in graph:
         raise ValueError(f"{end} not in graph")
 
-    q = [start]
     path = []
-    visited = set()
-    while q:
-        n1 = q.pop()
-        visited.add(n1)
-        path.append(n1)
-        if n1 == end:
-            return path  # <-- exit if end is found.
-        for n2 in graph.nodes(from_node=n1):
-            if n2 in visited:
-                continue
-            q.append(n2)
-            break
-        else:
-            path.remove(n1)
-            while not q and path:
-                for n2 in graph.nodes(from_node=path[-1]):
-                    if n2 in visited:
-                        continue
-                    q.append(n2)
-                    break
-                else:
-                    path = path[:-1]
+    for event, n1, n2 in dfs_events(graph, start):
+        if event == "discover":
+            path.append(n2)
+            if n2 == end:
+                return path  # <-- exit if end is found.
+        elif event == "finish":
+            path.pop()
     return None  # <-- exit if not path was found.
 
 
@@ -449,35 +962,73 @@ def depth_scan(graph, start, criteria):
     if not criteria(start):
         return set()
 
-    q = [start]
-    path = []
     visited = set()
-    while q:
-        n1 = q.pop()
-        visited.add(n1)
-        path.append(n1)
-        for n2 in graph.nodes(from_node=n1):
-            if n2 in visited:
-                continue
-            if not criteria(n2):
-                visited.add(n2)
+    for _ in dfs_events(graph, start, expand=lambda n: n == start or criteria(n), visited=visited):
+        pass
+    return visited
+
+
+def iter_depth_scan(graph, start, criteria=None, criteria_batch=None):
+    """ traverses the descendants of node `start` depth first and yields the
+    nodes where the criteria is True as they are found, so that the caller can
+    stop the scan at any time. The scan does not continue beyond nodes where
+    the criteria is False.
+
+    :param graph: class Graph
+    :param start: start node
+    :param criteria: function(node) that returns bool, or ...
+    :param criteria_batch: function(list of nodes) that returns a list of bool.
+                           It is called once for the new neighbours of each
+                           node that is expanded, which is useful when the
+                           criteria are costly to evaluate one at a time, such
+                           as database lookups.
+    :return: generator of nodes
+    """
+    if (criteria is None) == (criteria_batch is None):
+        raise ValueError("Use either criteria or criteria_batch")
+    if criteria is not None:
+        if not callable(criteria):
+            raise TypeError(f"Expected {criteria} to be callable")
+
+        def criteria_batch(nodes):
+            return [criteria(n) for n in nodes]
+
+    if not callable(criteria_batch):
+        raise TypeError(f"Expected {criteria_batch} to be callable")
+    if start not in graph:
+        raise ValueError(f"{start} not in graph")
+    return _iter_depth_scan(graph, start, criteria_batch)
+
+
+def _iter_depth_scan(graph, start, criteria_batch):
+    """ generator for iter_depth_scan, which validates the inputs. """
+    edges = graph._edges
+
+    def accepted(nodes):
+        results = list(criteria_batch(nodes))
+        if len(results) != len(nodes):
+            raise ValueError(f"criteria_batch returned {len(results)} values for {len(nodes)} nodes")
+        return [n for n, ok in zip(nodes, results) if ok]
+
+    if not accepted([start]):
+        return
+    yield start
+
+    visited = {start}
+    stack = [iter([start])]
+    while stack:
+        for n1 in stack[-1]:
+            candidates = [n2 for n2 in edges.get(n1, {}) if n2 not in visited]
+            if not candidates:
                 continue
-            q.append(n2)
-            break
+            visited.update(candidates)
+            children = accepted(candidates)
+            yield from children
+            if children:
+                stack.append(iter(children))
+                break
         else:
-            path.remove(n1)
-            while not q and path:
-                for n2 in graph.nodes(from_node=path[-1]):
-                    if n2 in visited:
-                        continue
-                    if not criteria(n2):
-                        visited.add(n2)
-                        continue
-                    q.append(n2)
-                    break
-                else:
-                    path = path[:-1]
-    return visited
+            stack.pop()
 
 
 def distance(graph, path):
@@ -758,17 +1309,106 @@ def is_partite(graph, n):
     return True, colours_and_nodes
 
 
-def has_cycles(graph):
-    """ Checks if graph has a cycle
+def has_cycles(graph, witness=False):
+    """ Checks if graph has a cycle, with a single depth first search over
+    all nodes in O(V+E): an edge back to a node on the current path of the
+    search closes a cycle.
+
     :param graph: instance of class Graph.
-    :return: bool
+    :param witness: bool: if True returns the first cycle found.
+    :return: bool, or with witness the cycle as list of nodes where the first
+             and last node are the same, e.g. [1, 2, 3, 1] (empty if none).
     """
-    for n1, n2, d in graph.edges():
-        if n1 == n2:
-            return True
-        if graph.is_connected(n2, n1):
-            return True
-    return False
+    assert isinstance(graph, BasicGraph)
+    visited = set()
+    for start in graph.nodes():
+        if start in visited:
+            continue
+        path = []
+        for event, n1, n2 in dfs_events(graph, start, visited=visited):
+            if event == "discover":
+                path.append(n2)
+            elif event == "finish":
+                path.pop()
+            else:  # back_edge
+                if not witness:
+                    return True
+                return path[path.index(n2):] + [n2]
+    return [] if witness else False
+
+
+class DisjointSet(object):
+    """
+    Disjoint-set forest (union-find) with path compression and union by rank,
+    whereby find and union take nearly O(1) amortised time.
+    """
+
+    def __init__(self, items=()):
+        self._parent = {}
+        self._rank = {}
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item):
+        return item in self._parent
+
+    def add(self, item):
+        """ adds item as a set of its own, unless it's known already. """
+        if item not in self._parent:
+            self._parent[item] = item
+            self._rank[item] = 0
+
+    def find(self, item):
+        """ returns the representative of the set of item. """
+        parent = self._parent
+        root = parent[item]
+        while parent[root] != root:
+            root = parent[root]
+        while parent[item] != root:  # path compression.
+            parent[item], item = root, parent[item]
+        return root
+
+    def union(self, item1, item2):
+        """ merges the sets of item1 and item2, adding them if unknown.
+        :return: bool: True if the sets were separate.
+        """
+        self.add(item1)
+        self.add(item2)
+        root1, root2 = self.find(item1), self.find(item2)
+        if root1 == root2:
+            return False
+        rank = self._rank
+        if rank[root1] < rank[root2]:
+            root1, root2 = root2, root1
+        self._parent[root2] = root1
+        if rank[root1] == rank[root2]:
+            rank[root1] += 1
+        return True
+
+    def same(self, item1, item2):
+        """ returns True if item1 and item2 are in the same set. """
+        return self.find(item1) == self.find(item2)
+
+    def sets(self):
+        """ returns the sets as list of sets of items. """
+        sets = {}
+        for item in self._parent:
+            sets.setdefault(self.find(item), set()).add(item)
+        return list(sets.values())
+
+
+def _disjoint_set(graph):
+    """ returns a DisjointSet of the components of graph, built in one pass
+    over the edges, or the one kept by graph.track_components(). """
+    if graph._disjoint_set is not None:
+        return graph._disjoint_set
+    disjoint_set = DisjointSet(graph.nodes())
+    for n1, edges in graph._edges.items():
+        for n2 in edges:
+            disjoint_set.union(n1, n2)
+    if graph._track_components:
+        graph._disjoint_set = disjoint_set
+    return disjoint_set
 
 
 def components(graph):
@@ -776,59 +1416,152 @@ def components(graph):
     :param graph: instance of class Graph
     :return: list of sets of nodes. Each set is a component.
     """
+    if isinstance(graph, FrozenGraph):
+        return graph.components()
+    assert isinstance(graph, BasicGraph)
+    return _disjoint_set(graph).sets()
+
+
+def same_component(graph, n1, n2):
+    """ Determines if n1 and n2 are in the same (weakly connected) component.
+    :param graph: instance of class Graph
+    :param n1: node
+    :param n2: node
+    :return: bool
+    """
+    assert isinstance(graph, BasicGraph)
+    for n in (n1, n2):
+        if n not in graph:
+            raise ValueError(f"{n} not in graph")
+    return _disjoint_set(graph).same(n1, n2)
+
+
+def strongly_connected_components(graph):
+    """ Determines the strongly connected components of the graph with an
+    iterative version of Tarjan's algorithm in O(V+E).
+
+    :param graph: instance of class Graph
+    :return: list of sets of nodes, in topological order: no component has
+             an edge to a component before it in the list.
+    """
+    assert isinstance(graph, BasicGraph)
+    edges = graph._edges
+    index, low = {}, {}  # order of discovery & lowest index reachable.
+    stack, on_stack = [], set()
+    result = []
+    for start in graph.nodes():
+        if start in index:
+            continue
+        index[start] = low[start] = len(index)
+        stack.append(start)
+        on_stack.add(start)
+        work = [(start, iter(edges.get(start, {})))]
+        while work:
+            n1, children = work[-1]
+            for n2 in children:
+                if n2 not in index:
+                    index[n2] = low[n2] = len(index)
+                    stack.append(n2)
+                    on_stack.add(n2)
+                    work.append((n2, iter(edges.get(n2, {}))))
+                    break
+                if n2 in on_stack:
+                    low[n1] = min(low[n1], index[n2])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[n1])
+                if low[n1] == index[n1]:  # n1 is the root of a component.
+                    component = set()
+                    while True:
+                        n = stack.pop()
+                        on_stack.discard(n)
+                        component.add(n)
+                        if n == n1:
+                            break
+                    result.append(component)
+    result.reverse()  # Tarjan finds the components in reverse topological order.
+    return result
+
+
+def condensation(graph):
+    """ Contracts each strongly connected component of the graph to a single
+    node, which gives a directed acyclic graph (DAG).
+
+    :param graph: instance of class Graph
+    :return: tuple:
+             DAG as Graph, whose nodes are the component numbers 0, 1, ... in
+             topological order, with the set of nodes of each component as
+             node object. The value of an edge is the smallest value of the
+             edges between the two components.
+             dict {node: component number}
+    """
     assert isinstance(graph, BasicGraph)
-    nodes = set(graph.nodes())
-    sets_of_components = []
-    while nodes:
-        new_component = set()
-        sets_of_components.append(new_component)
-        n = nodes.pop()  # select random node
-        new_component.add(n)  # add it to the new component.
-
-        new_nodes = set(graph.nodes(from_node=n))
-        new_nodes.update(set(graph.nodes(to_node=n)))
-        while new_nodes:
-            n = new_nodes.pop()
-            new_component.add(n)
-            new_nodes.update(set(n for n in graph.nodes(from_node=n) if n not in new_component))
-            new_nodes.update(set(n for n in graph.nodes(to_node=n) if n not in new_component))
-        nodes = nodes - new_component
-    return sets_of_components
+    dag = Graph()
+    members = {}
+    for i, component in enumerate(strongly_connected_components(graph)):
+        dag.add_node(i, obj=component)
+        for n in component:
+            members[n] = i
+    for n1, n2, d in graph.edges():
+        c1, c2 = members[n1], members[n2]
+        if c1 != c2:
+            value = dag.edge(c1, c2)
+            if value is None or d < value:
+                dag.add_edge(c1, c2, d)
+    return dag, members
 
 
 def network_size(graph, n1, degrees_of_separation=None):
     """ Determines the nodes within the range given by
-    a degree of separation
+    a degree of separation. Uses a direction optimizing breadth first search,
+    which sweeps bottom-up over the incoming edges once the frontier is large.
     :param graph: Graph
     :param n1: start node
     :param degrees_of_separation: integer
     :return: set of nodes within given range
     """
+    if isinstance(graph, FrozenGraph):
+        return graph.network_size(n1, degrees_of_separation)
     assert isinstance(graph, BasicGraph)
-    assert n1 in graph.nodes()
+    assert n1 in graph
     if degrees_of_separation is not None:
         assert isinstance(degrees_of_separation, int)
 
+    # direction optimizing, with the same switches as FrozenGraph._bfs.
+    alpha, beta = 14, 24
+    edges, reverse_edges = graph._edges, graph._reverse_edges
+    n = len(graph._nodes)
+    unexplored_edges = sum(len(e) for e in edges.values())
     network = {n1}
-    q = set(graph.nodes(from_node=n1))
-
-    scan_depth = 1
-    while True:
-        if not q:  # then there's no network.
+    q = [n1]
+    scan_depth = 0
+    unvisited = None  # set of nodes outside the network whilst searching bottom-up.
+    while q:
+        if degrees_of_separation is not None and scan_depth >= degrees_of_separation:
             break
-
-        if degrees_of_separation is not None:
-            if scan_depth > degrees_of_separation:
-                break
-
-        new_q = set()
-        for peer in q:
-            if peer in network:
-                continue
-            else:
-                network.add(peer)
-                new_peers = set(graph.nodes(from_node=peer)) - network
-                new_q.update(new_peers)
+        frontier_edges = sum(len(edges.get(peer, ())) for peer in q)
+        unexplored_edges -= frontier_edges
+        if unvisited is None and frontier_edges > unexplored_edges / alpha:
+            unvisited = set(graph._nodes).difference(network)
+        elif unvisited is not None and len(q) < n / beta:
+            unvisited = None
+
+        new_q = []
+        if unvisited is not None:  # bottom-up: find a parent in the frontier.
+            frontier = set(q)
+            for peer in unvisited:
+                if not frontier.isdisjoint(reverse_edges.get(peer, ())):
+                    new_q.append(peer)
+            unvisited.difference_update(new_q)
+            network.update(new_q)
+        else:
+            for peer in q:
+                for new_peer in edges.get(peer, {}):
+                    if new_peer not in network:
+                        network.add(new_peer)
+                        new_q.append(new_peer)
         q = new_q
         scan_depth += 1
     return network
@@ -836,36 +1569,56 @@ def network_size(graph, n1, degrees_of_separation=None):
 
 def phase_lines(graph):
     """ Determines the phase lines of a directed graph.
+
+    A node is in phase 0 if it has no incoming edges, and otherwise in the
+    phase after the last of its predecessors. In a cycle, a node waits for
+    its predecessors outside the cycle. A node without such predecessors is
+    in the phase after the first of its predecessors in the cycle.
+
+    The layering is a single pass over the strongly connected components in
+    topological order, so it takes O(V+E) time, plus O(C log C) for a cycle
+    of C nodes.
+
     :param graph: Graph
     :return: dictionary with node id : phase in cut.
     """
-    phases = {n: 0 for n in graph.nodes()}
-    sinks = {n: set() for n in phases}  # sinks[e] = {s1,s2}
-    edges = {n: set() for n in phases}
-    for s, e, d in graph.edges():
-        sinks[e].add(s)
-        edges[s].add(e)
-
-    level = 0
-    while sinks:
-        sources = [e for e in sinks if not sinks[e]]  # these nodes have in_degree=0
-        if not sources:
-            raise AttributeError("The graph does not have any sinks.")
-        for s in sources:
-            phases[s] = level  # let's update the phase value
-            del sinks[s]  # and let's remove their sink entry.
-            # and remove their set item from the sinks dict
-            for e in edges[s]:
-                if e not in sinks:
-                    continue
-                sinks[e].discard(s)
-                # but also check if their descendants are loops.
-                for s2 in list(sinks[e]):
-                    if graph.is_connected(e, s2):
-                        sinks[e].discard(s2)
-        level += 1
+    assert isinstance(graph, BasicGraph)
+    predecessors = graph._reverse_edges
+    phases = {}
+    for component in strongly_connected_components(graph):
+        if len(component) == 1:
+            n = next(iter(component))
+            inputs = [phases[s] for s in predecessors.get(n, {}) if s != n]
+            if inputs:
+                phases[n] = max(inputs) + 1
+            elif n not in predecessors.get(n, {}):
+                phases[n] = 0
+            else:  # a loop onto itself, that nothing leads into.
+                raise AttributeError("The graph does not have any sinks.")
+            continue
 
-    return phases
+        # nodes with predecessors outside the cycle enter it. The others
+        # follow the first of their predecessors in the cycle.
+        q, tiebreak = [], count()  # as nodes may not be comparable.
+        entries = set()  # nodes with predecessors outside the cycle.
+        for n in component:
+            inputs = [phases[s] for s in predecessors.get(n, {}) if s not in component]
+            if inputs:
+                entries.add(n)
+                heappush(q, (max(inputs) + 1, next(tiebreak), n))
+        if not q:
+            raise AttributeError("The graph does not have any sinks.")
+        done = set()
+        while q:
+            phase, _, n = heappop(q)
+            if n in done:
+                continue
+            done.add(n)
+            phases[n] = phase
+            for n2 in graph._edges.get(n, {}):
+                if n2 in component and n2 not in done and n2 not in entries:
+                    heappush(q, (phase + 1, next(tiebreak), n2))
+    return {n: phases[n] for n in graph.nodes()}
 
 
 def sources(graph, n):
@@ -927,15 +1680,114 @@ def adjacency_matrix(graph):
          5: {1: inf, 2: inf, 3: inf, 4: 6, 5: 0}}
     """
     assert isinstance(graph, BasicGraph)
-    return {v1: {v2: 0 if v1 == v2 else graph.edge(v1, v2, default=float('inf'))
-                 for v2 in graph.nodes()}
-            for v1 in graph.nodes()}
+    nodes = graph.nodes()
+    matrix = {}
+    for v1 in nodes:
+        row = dict.fromkeys(nodes, float('inf'))
+        row.update(graph._edges.get(v1, {}))
+        row[v1] = 0
+        matrix[v1] = row
+    return matrix
+
+
+def _node_index(graph, nodelist):
+    """ returns the nodes and {node: position} for nodelist, or for all nodes if None. """
+    if nodelist is None:
+        nodes = graph.nodes()
+    else:
+        nodes = list(nodelist)
+        for n in nodes:
+            if n not in graph:
+                raise ValueError(f"{n} not in graph")
+    index = {n: i for i, n in enumerate(nodes)}
+    if len(index) != len(nodes):
+        raise ValueError("nodelist contains duplicates")
+    return nodes, index
+
+
+def to_numpy(graph, nodelist=None, nonedge=float('inf')):
+    """ Converts the graph to a dense numpy adjacency matrix, in one pass over
+    the edges.
+
+    :param graph: instance of BasicGraph
+    :param nodelist: list of nodes in the order of the rows and columns, or
+                     None for graph.nodes(). Edges to other nodes are left out.
+    :param nonedge: value of pairs without an edge.
+    :return: numpy array (float64) where matrix[i, j] is the edge from
+             nodelist[i] to nodelist[j], and dict {node: position}.
+             Unlike adjacency_matrix, the diagonal has the values of the
+             edges from a node to itself (or nonedge), as to_csr.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("to_numpy requires numpy")
+    assert isinstance(graph, BasicGraph)
+    nodes, index = _node_index(graph, nodelist)
+    rows, columns, values = [], [], []
+    for n1 in nodes:
+        i = index[n1]
+        for n2, d in graph._edges.get(n1, {}).items():
+            j = index.get(n2)
+            if j is not None:
+                rows.append(i)
+                columns.append(j)
+                values.append(d)
+    matrix = np.full((len(nodes), len(nodes)), nonedge, dtype='float64')
+    matrix[rows, columns] = values
+    return matrix, index
+
+
+def to_csr(graph, nodelist=None):
+    """ Converts the graph to compressed sparse rows, in one pass over the edges.
+
+    The edges of node i are indices[indptr[i]:indptr[i + 1]] with the values
+    data[indptr[i]:indptr[i + 1]], as scipy.sparse.csr_matrix((data, indices, indptr))
+    expects. The arrays support the buffer protocol, so numpy.frombuffer
+    reads them without a copy.
+
+    :param graph: instance of BasicGraph
+    :param nodelist: list of nodes in the order of the rows and columns, or
+                     None for graph.nodes(). Edges to other nodes are left out.
+    :return: indptr as array('l'), indices as array('l'), data as array('d')
+    """
+    assert isinstance(graph, BasicGraph)
+    nodes, index = _node_index(graph, nodelist)
+    indptr, indices, data = array('l', [0]), array('l'), array('d')
+    for n1 in nodes:
+        for n2, d in graph._edges.get(n1, {}).items():
+            j = index.get(n2)
+            if j is not None:
+                indices.append(j)
+                data.append(d)
+        indptr.append(len(indices))
+    return indptr, indices, data
 
 
-def all_pairs_shortest_paths(graph):
+def all_pairs_shortest_paths(graph, method='floyd-warshall', dtype='float64', block_size=None, workers=None,
+                             paths=False, filename=None):
     """Find the cost of the shortest path between every pair of vertices in a
     weighted graph. Uses the Floyd-Warshall algorithm.
 
+    :param graph: instance of Graph
+    :param method: 'floyd-warshall' or 'numpy'.
+        floyd-warshall: returns dict {n1: {n2: distance}}.
+        numpy: vectorised Floyd-Warshall on a numpy matrix (requires numpy).
+               Returns a DistanceMatrix, with `to_dict()` for the dict above.
+        johnson: one Dijkstra search per node, which suits sparse graphs.
+                 Returns the dict above. Use graph.all_pairs.johnson to
+                 stream the rows instead.
+    :param dtype: (numpy) 'float64' or 'float32'.
+    :param block_size: (numpy) int: number of pivots per block of the tiled
+                       algorithm, or None.
+    :param workers: (johnson) int: number of processes. None uses all cores.
+    :param paths: bool: if True returns (distances, PredecessorMatrix), where
+                  PredecessorMatrix.path(n1, n2) rebuilds the shortest path
+                  from n1 to n2 without further search.
+    :param filename: (numpy, johnson) str or pathlib.Path: writes the distances
+                     to a memory mapped file and returns a DistanceMatrix, which
+                     DistanceMatrix.load can reopen later (requires numpy).
+
     Example:
         inf = float('inf')
         g = Graph(from_dict=(
@@ -961,6 +1813,24 @@ def all_pairs_shortest_paths(graph):
              4: {1: 2, 2: -1, 3: -5, 4: 0, 5: -2},
              5: {1: 8, 2: 5, 3: 1, 4: 6, 5: 0}}
     """
+    if method == 'numpy':
+        from graph.all_pairs import floyd_warshall
+        return floyd_warshall(graph, dtype=dtype, block_size=block_size, paths=paths, filename=filename)
+    if method == 'johnson':
+        from graph.all_pairs import johnson, johnson_paths, johnson_matrix
+        if filename is not None:
+            return johnson_matrix(graph, workers=workers, paths=paths, dtype=dtype, filename=filename)
+        if paths:
+            return johnson_paths(graph, workers=workers)
+        return dict(johnson(graph, workers=workers))
+    if method != 'floyd-warshall':
+        raise ValueError(f"expected method to be 'floyd-warshall', 'numpy' or 'johnson', not {method}")
+    if filename is not None:
+        raise ValueError("filename requires method 'numpy' or 'johnson'")
+    if paths:
+        from graph.all_pairs import floyd_warshall_paths
+        return floyd_warshall_paths(graph)
+
     g = graph.adjacency_matrix()
     assert isinstance(g, dict)
     vertices = g.keys()
@@ -972,24 +1842,32 @@ def all_pairs_shortest_paths(graph):
     return g
 
 
-def minsum(graph):
-    """ finds the mode(s) that have the smallest sum of distance to all other nodes. """
+def minsum(graph, workers=1, sample=None, seed=None):
+    """ finds the mode(s) that have the smallest sum of distance to all other nodes.
+
+    :param graph: instance of Graph
+    :param workers: int: number of processes. None uses all cores.
+    :param sample: int: number of sampled nodes for an approximate answer.
+    :param seed: (sample) seed for the random choice of nodes.
+    :return: list of nodes, or (list of nodes, error bound) with sample.
+    """
     assert isinstance(graph, Graph)
-    adj_mat = graph.all_pairs_shortest_paths()
-    for n in adj_mat:
-        adj_mat[n] = sum(adj_mat[n].values())
-    smallest = min(adj_mat.values())
-    return [k for k, v in adj_mat.items() if v == smallest]
+    from graph.all_pairs import facility_location
+    return facility_location(graph, objective='sum', workers=workers, sample=sample, seed=seed)
 
 
-def minmax(graph):
-    """ finds the node(s) with shortest distance to all other nodes. """
+def minmax(graph, workers=1, sample=None, seed=None):
+    """ finds the node(s) with shortest distance to all other nodes.
+
+    :param graph: instance of Graph
+    :param workers: int: number of processes. None uses all cores.
+    :param sample: int: number of sampled nodes for an approximate answer.
+    :param seed: (sample) seed for the random choice of nodes.
+    :return: list of nodes, or (list of nodes, error bound) with sample.
+    """
     assert isinstance(graph, Graph)
-    adj_mat = graph.all_pairs_shortest_paths()
-    for n in adj_mat:
-        adj_mat[n] = max(adj_mat[n].values())
-    smallest = min(adj_mat.values())
-    return [k for k, v in adj_mat.items() if v == smallest]
+    from graph.all_pairs import facility_location
+    return facility_location(graph, objective='max', workers=workers, sample=sample, seed=seed)
 
 
 def shortest_tree_all_pairs(graph):
@@ -1054,54 +1932,139 @@ def all_paths(graph, start, end):
     :param graph: instance of Graph
     :param start: node
     :param end: node
-    :return: list of paths unique from start to end.
+    :return: list of paths unique from start to end, without repeated nodes.
+             Use iter_simple_paths to generate them one at a time.
+    """
+    return list(iter_simple_paths(graph, start, end))
+
+
+def iter_simple_paths(graph, start, end, max_length=None, max_paths=None, workers=1):
+    """ Generates the simple paths (without repeated nodes) from start to end,
+    one at a time. Only the current path is kept in memory, so enumeration
+    can be stopped at any time and max_paths / max_length bound the work.
+
+    :param graph: instance of Graph
+    :param start: node
+    :param end: node
+    :param max_length: int: max number of edges in a path, or None.
+    :param max_paths: int: max number of paths generated, or None.
+    :param workers: int: number of processes. With more than 1, the paths via
+                    each first hop from start are enumerated in a separate
+                    task. Each task collects its paths before they are
+                    generated, so use max_paths or max_length to bound
+                    the tasks. None uses all cores.
+    :return: generator of paths (as lists)
     """
     if start == end:
         raise ValueError("start is end")
-    if not graph.is_connected(start, end):
-        return []
-    paths = [(start,)]
-    q = [start]
-    skip_list = set()
-    while q:
-        n1 = q.pop(0)
-        if n1 == end:
-            continue
+    for name, value in [('max_length', max_length), ('max_paths', max_paths), ('workers', workers)]:
+        if value is not None and (not isinstance(value, int) or value < 1):
+            raise ValueError(f"expected {name} to be int >= 1, not {value}")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return _iter_simple_paths(graph, start, end, max_length, max_paths, workers)
+
+
+def _iter_simple_paths(graph, start, end, max_length, max_paths, workers):
+    """ generator for iter_simple_paths, which validates the inputs. """
+    if start not in graph or end not in graph:
+        return
+    if workers == 1:
+        edges = graph._edges
+        paths = _simple_paths(lambda n: edges.get(n, {}), start, end, max_length)
+    else:
+        paths = _simple_paths_parallel(graph, start, end, max_length, max_paths, workers)
+    try:
+        for count, path in enumerate(paths, start=1):
+            yield path
+            if count == max_paths:
+                break
+    finally:
+        paths.close()  # stops the worker processes, if any.
 
-        n2s = graph.nodes(from_node=n1)
-        new_paths = [p for p in paths if p[-1] == n1]
-        for n2 in n2s:
-            if n2 in skip_list:
-                continue
-            n3s = graph.nodes(from_node=n2)
-            if len(n3s) > 1 and graph.is_connected(n2, n1):
-                # it's a fork and it's a part of a loop!
-                # is the sequence n2,n3 already in the path?
-                for n3 in n3s:
-                    for path in new_paths:
-                        a = [n2, n3]
-                        if any(all(path[i+j] == a[j] for j in range(len(a))) for i in range(len(path))):
-                            skip_list.add(n3)
-
-            for path in new_paths:
-                if path in paths:
-                    paths.remove(path)
-
-                new_path = path + (n2,)
-                if new_path not in paths:
-                    paths.append(new_path)
-
-            if n2 not in q:
-                q.append(n2)
 
-    paths = [list(p) for p in paths if p[-1] == end]
-    return paths
+def _simple_paths(neighbours, start, end, max_length=None, excluded=()):
+    """ depth first enumeration of simple paths using a stack of iterators.
+    :param neighbours: function(node) that returns the nodes after node.
+    :param start: node
+    :param end: node
+    :param max_length: int: max number of edges in a path, or None.
+    :param excluded: nodes that may not be on the path.
+    :return: generator of paths (as lists)
+    """
+    path = [start]
+    on_path = set(excluded)
+    on_path.add(start)
+    stack = [iter(neighbours(start))]
+    while stack:
+        for n2 in stack[-1]:
+            if n2 in on_path:
+                continue
+            if n2 == end:
+                yield path + [n2]
+            elif max_length is None or len(path) < max_length:
+                path.append(n2)
+                on_path.add(n2)
+                stack.append(iter(neighbours(n2)))
+                break
+        else:
+            stack.pop()
+            on_path.discard(path.pop())
+
+
+def _simple_paths_parallel(graph, start, end, max_length, max_paths, workers):
+    """ splits iter_simple_paths by the first hop from start. """
+    frozen = graph if isinstance(graph, FrozenGraph) else FrozenGraph(graph)
+    s, e = frozen._index[start], frozen._index[end]
+    first_hops = frozen._targets[frozen._offsets[s]:frozen._offsets[s + 1]]
+    if e in first_hops:
+        yield [start, end]
+    if max_length == 1:
+        return
+    rest = None if max_length is None else max_length - 1
+    tasks = [(i, s, e, rest, max_paths) for i in first_hops if i not in (s, e)]
+    futures = []
+    if len(tasks) < 2:
+        batches = (_simple_paths_from_hop(task, frozen) for task in tasks)
+        pool = None
+    else:
+        pool = _worker_pool(workers, frozen)
+        futures = [pool.submit(_simple_paths_from_hop, task) for task in tasks]
+        batches = (future.result() for future in futures)
+    try:
+        node_ids = frozen._node_ids
+        for batch in batches:
+            for path in batch:
+                yield [start] + [node_ids[i] for i in path]
+    finally:
+        if pool is not None:
+            for future in futures:  # shutdown(cancel_futures=True) requires python 3.9
+                future.cancel()
+            pool.shutdown(wait=False)
+
+
+def _simple_paths_from_hop(task, frozen=None):
+    """ enumerates the simple paths via one first hop.
+    :param task: first hop index, start index, end index, max_length, max_paths
+    :param frozen: FrozenGraph, defaults to the graph of the worker process.
+    :return: list of paths as lists of node indices, without start.
+    """
+    hop, start, end, max_length, max_paths = task
+    if frozen is None:
+        frozen, = _worker_state()
+    offsets, targets = frozen._offsets, frozen._targets
+    paths = _simple_paths(lambda i: targets[offsets[i]:offsets[i + 1]], hop, end, max_length, excluded=(start,))
+    if max_paths is not None:
+        paths = (p for _, p in zip(range(max_paths), paths))
+    return list(paths)
 
 
 def degree_of_separation(graph, n1, n2):
     """ Calculates the degree of separation between 2 nodes."""
-    assert n1 in graph.nodes()
-    d, p = breadth_first_search(graph, n1, n2)
+    if isinstance(graph, FrozenGraph):
+        return graph.degree_of_separation(n1, n2)
+    assert n1 in graph
+    d, p = breadth_first_search_bidirectional(graph, n1, n2)
     return d
 
 
@@ -1125,13 +2088,63 @@ class Graph(BasicGraph):
             g.add_edge(s, e, d)
         return g
 
-    def shortest_path(self, start, end):
+    def shortest_path(self, start, end, landmarks=None, weights=None):
+        """
+        :param start: start node
+        :param end: end node
+        :param landmarks: (optional) LandmarkIndex from g.build_landmark_index()
+                          used to guide the search (A* with landmarks).
+        :param weights: None or 'int': use a bucket queue for edge values that
+                        are small ints >= 0.
+        :return: distance, path as list
+        """
+        if landmarks is not None:
+            return landmarks.shortest_path(start, end)
+        return shortest_path(graph=self, start=start, end=end, weights=weights)
+
+    def k_shortest_paths(self, start, end, k):
+        """
+        :param start: start node
+        :param end: end node
+        :param k: int: number of paths.
+        :return: list of (distance, path), shortest first.
+        """
+        return k_shortest_paths(graph=self, start=start, end=end, k=k)
+
+    def shortest_path_tree(self, start, cutoff=None, targets=None):
+        """
+        :param start: start node
+        :param cutoff: (optional) max distance from start.
+        :param targets: (optional) nodes; the search stops when all are reached.
+        :return: ShortestPathTree with .distances, .parents and .path(node)
+        """
+        return shortest_path_tree(graph=self, start=start, cutoff=cutoff, targets=targets)
+
+    def shortest_paths_many(self, pairs, workers=None):
+        """
+        :param pairs: list of (start, end)
+        :param workers: int: number of processes. None uses all cores.
+        :return: list of (distance, path) in the same order as pairs.
+        """
+        return shortest_paths_many(graph=self, pairs=pairs, workers=workers)
+
+    def shortest_path_bidirectional(self, start, end):
+        """
+        :param start: start node
+        :param end: end node
+        :return: distance, path as list
+        """
+        return shortest_path_bidirectional(graph=self, start=start, end=end)
+
+    def a_star_search(self, start, end, heuristic):
         """
         :param start: start node
         :param end: end node
+        :param heuristic: callable, heuristic(node) returns the estimated distance
+                          from node to end (must not overestimate).
         :return: distance, path as list
         """
-        return shortest_path(graph=self, start=start, end=end)
+        return a_star_search(graph=self, start=start, end=end, heuristic=heuristic)
 
     def breadth_first_search(self, start, end):
         """ Determines the path with fewest nodes.
@@ -1141,6 +2154,14 @@ class Graph(BasicGraph):
         """
         return breadth_first_search(graph=self, start=start, end=end)
 
+    def breadth_first_search_bidirectional(self, start, end):
+        """ Determines the path with fewest nodes, searching from both ends.
+        :param start: start node
+        :param end: end nodes
+        :return: nodes, path as list
+        """
+        return breadth_first_search_bidirectional(graph=self, start=start, end=end)
+
     def depth_first_search(self, start, end):
         """
         Finds a path from start to end using DFS.
@@ -1150,6 +2171,16 @@ class Graph(BasicGraph):
         """
         return depth_first_search(graph=self, start=start, end=end)
 
+    def dfs_events(self, start, expand=None):
+        """ Generator of the events of a depth first search from start.
+        :param start: start node
+        :param expand: (optional) callable, expand(node) returns False if the
+                       search should not continue beyond node.
+        :return: generator of (event, n1, n2) where event is
+                 "discover", "finish" or "back_edge".
+        """
+        return dfs_events(graph=self, start=start, expand=expand)
+
     def depth_scan(self, start, criteria):
         """
         traverses the descendants of node `start` using callable `criteria` to determine
@@ -1162,6 +2193,18 @@ class Graph(BasicGraph):
         """
         return depth_scan(graph=self, start=start, criteria=criteria)
 
+    def iter_depth_scan(self, start, criteria=None, criteria_batch=None):
+        """
+        yields the descendants of node `start` where the criteria is True,
+        without scanning beyond nodes where it is False.
+
+        :param start: start node
+        :param criteria: function(node) that returns bool, or ...
+        :param criteria_batch: function(list of nodes) that returns a list of bool.
+        :return: generator of nodes
+        """
+        return iter_depth_scan(graph=self, start=start, criteria=criteria, criteria_batch=criteria_batch)
+
     def distance_from_path(self, path):
         """
         :param path: list of nodes
@@ -1210,11 +2253,12 @@ class Graph(BasicGraph):
         """
         return is_partite(self, n)
 
-    def has_cycles(self):
+    def has_cycles(self, witness=False):
         """ Checks if the graph has a cycle
-        :return: bool
+        :param witness: bool: if True returns the first cycle found.
+        :return: bool, or with witness the cycle as list of nodes (empty if none).
         """
-        return has_cycles(graph=self)
+        return has_cycles(graph=self, witness=witness)
 
     def components(self):
         """ Determines the number of components
@@ -1222,6 +2266,25 @@ class Graph(BasicGraph):
         """
         return components(graph=self)
 
+    def same_component(self, n1, n2):
+        """ Determines if n1 and n2 are in the same component.
+        See also track_components.
+        :return: bool
+        """
+        return same_component(graph=self, n1=n1, n2=n2)
+
+    def strongly_connected_components(self):
+        """ Determines the strongly connected components
+        :return: list of sets of nodes, in topological order.
+        """
+        return strongly_connected_components(graph=self)
+
+    def condensation(self):
+        """ Contracts each strongly connected component to a single node.
+        :return: DAG as Graph of component numbers, dict {node: component number}
+        """
+        return condensation(graph=self)
+
     def network_size(self, n1, degrees_of_separation=None):
         """ Determines the nodes within the range given by
         a degree of separation
@@ -1263,25 +2326,59 @@ class Graph(BasicGraph):
         """
         return adjacency_matrix(graph=self)
 
-    def minsum(self):
+    def to_numpy(self, nodelist=None, nonedge=float('inf')):
+        """
+        Converts the graph to a dense numpy adjacency matrix (requires numpy).
+        :param nodelist: list of nodes in the order of the rows and columns, or None for all.
+        :param nonedge: value of pairs without an edge.
+        :return: numpy array, dict {node: position}
+        """
+        return to_numpy(graph=self, nodelist=nodelist, nonedge=nonedge)
+
+    def to_csr(self, nodelist=None):
+        """
+        Converts the graph to compressed sparse rows.
+        :param nodelist: list of nodes in the order of the rows and columns, or None for all.
+        :return: indptr, indices, data as arrays.
+        """
+        return to_csr(graph=self, nodelist=nodelist)
+
+    def minsum(self, workers=1, sample=None, seed=None):
         """ Finds the mode(s) that have the smallest sum of distance to all other nodes.
-        :return: list of nodes
+        :param workers: int: number of processes. None uses all cores.
+        :param sample: int: number of sampled nodes for an approximate answer.
+        :param seed: (sample) seed for the random choice of nodes.
+        :return: list of nodes, or (list of nodes, error bound) with sample.
         """
-        return minsum(self)
+        return minsum(self, workers=workers, sample=sample, seed=seed)
 
-    def minmax(self):
+    def minmax(self, workers=1, sample=None, seed=None):
         """ Finds the node(s) with shortest distance to all other nodes.
-        :return: list of nodes
+        :param workers: int: number of processes. None uses all cores.
+        :param sample: int: number of sampled nodes for an approximate answer.
+        :param seed: (sample) seed for the random choice of nodes.
+        :return: list of nodes, or (list of nodes, error bound) with sample.
         """
-        return minmax(self)
+        return minmax(self, workers=workers, sample=sample, seed=seed)
 
-    def all_pairs_shortest_paths(self):
+    def all_pairs_shortest_paths(self, method='floyd-warshall', dtype='float64', block_size=None, workers=None,
+                                 paths=False, filename=None):
         """
         Find the cost of the shortest path between every pair of vertices in a
         weighted graph. Uses the Floyd-Warshall algorithm.
-        :return: dict {node 1: {node 2: distance}, ...}
+        :param method: 'floyd-warshall', 'numpy' (vectorised, requires numpy)
+                       or 'johnson' (Dijkstra per node, for sparse graphs).
+        :param dtype: (numpy) 'float64' or 'float32'.
+        :param block_size: (numpy) int: pivots per block of the tiled algorithm.
+        :param workers: (johnson) int: number of processes. None uses all cores.
+        :param paths: bool: if True the predecessors are returned as well.
+        :param filename: (numpy, johnson) str or pathlib.Path for a memory mapped DistanceMatrix.
+        :return: dict {node 1: {node 2: distance}, ...},
+                 or DistanceMatrix with method 'numpy' or a filename.
+                 With paths: (distances, PredecessorMatrix).
         """
-        return all_pairs_shortest_paths(graph=self)
+        return all_pairs_shortest_paths(graph=self, method=method, dtype=dtype, block_size=block_size,
+                                        workers=workers, paths=paths, filename=filename)
 
     def shortest_tree_all_pairs(self):
         """
@@ -1305,6 +2402,19 @@ class Graph(BasicGraph):
         """
         return all_paths(graph=self, start=start, end=end)
 
+    def iter_simple_paths(self, start, end, max_length=None, max_paths=None, workers=1):
+        """
+        generates the paths from start to end that don't repeat nodes.
+        :param start: node
+        :param end: node
+        :param max_length: int: max number of edges in a path, or None.
+        :param max_paths: int: max number of paths generated, or None.
+        :param workers: int: number of processes. With more than 1, the first
+                        hops from start are split over the processes.
+        :return: generator of paths (as lists)
+        """
+        return iter_simple_paths(self, start, end, max_length=max_length, max_paths=max_paths, workers=workers)
+
     def degree_of_separation(self, n1, n2):
         """ determines the degree of separation between 2 nodes
         :param n1: node
@@ -1313,6 +2423,32 @@ class Graph(BasicGraph):
         """
         return degree_of_separation(self, n1, n2)
 
+    def build_contraction_hierarchy(self, auto_rebuild=False):
+        """ Preprocesses the graph for fast repeated shortest path queries.
+        :param auto_rebuild: bool: if True, the hierarchy is rebuilt when the
+                             graph has changed, instead of raising ValueError.
+        :return: ContractionHierarchy with method query(start, end)
+        """
+        from graph.contraction_hierarchy import ContractionHierarchy
+        return ContractionHierarchy(self, auto_rebuild=auto_rebuild)
+
+    def build_landmark_index(self, k=8, strategy='avoid', workers=None, seed=None):
+        """ Preprocesses the graph for goal directed search (A* with landmarks).
+        :param k: int: number of landmarks.
+        :param strategy: str: landmark selection; 'random', 'farthest' or 'avoid'.
+        :param workers: int: number of processes. None uses all cores.
+        :param seed: seed for random number generator
+        :return: LandmarkIndex, for use as g.shortest_path(start, end, landmarks=index)
+        """
+        from graph.landmarks import LandmarkIndex
+        return LandmarkIndex(self, k=k, strategy=strategy, workers=workers, seed=seed)
+
+    def freeze(self):
+        """ Creates an immutable compressed sparse row snapshot of the graph.
+        :return: FrozenGraph
+        """
+        return FrozenGraph(self)
+
 
 class Graph3D(Graph):
     """ a graph where all (x,y)-positions are unique. """
@@ -1350,6 +2486,25 @@ class Graph3D(Graph):
         c = abs(z2 - z1)
         return (a * a + b * b + c * c) ** (1 / 2)
 
+    def shortest_path(self, start, end, landmarks=None, a_star=False, weights=None):
+        """
+        :param start: start node
+        :param end: end node
+        :param landmarks: (optional) LandmarkIndex from g.build_landmark_index()
+                          used to guide the search (A* with landmarks).
+        :param a_star: bool: if True, the straight line distance to `end` is
+                       used as heuristic to guide the search (A*).
+                       Requires that no edge value is smaller than the
+                       distance between its nodes.
+        :param weights: None or 'int': use a bucket queue for edge values that
+                        are small ints >= 0. Not used with a_star.
+        :return: distance, path as list
+        """
+        if not a_star:
+            return super().shortest_path(start, end, landmarks=landmarks, weights=weights)
+        self._check_tuples(end)
+        return a_star_search(graph=self, start=start, end=end, heuristic=lambda n: self.distance(n, end))
+
     def add_edge(self, n1, n2, value=None, bidirectional=False):
         self._check_tuples(n1)
         self._check_tuples(n2)
@@ -1390,3 +2545,489 @@ class Graph3D(Graph):
         :return: None. Plots figure.
         """
         return plot_3d(self, nodes, edges, rotation, maintain_aspect_ratio)
+
+
+class FrozenGraph(object):
+    """ An immutable snapshot of a graph stored in compressed sparse row (CSR) form.
+
+    Every node is mapped to an integer index. The edges from node `i` are found
+    at `targets[offsets[i]:offsets[i+1]]` with the values at the same positions
+    in `weights`. A mirrored (reversed) CSR serves incoming-edge queries.
+
+    The typed arrays use a small fraction of the memory of the nested dicts in
+    BasicGraph and keep neighbours adjacent in memory, which suits read-heavy
+    workloads. Use `thaw()` to obtain a mutable graph again.
+
+    All edge values are stored as float64. If every value is an int they are
+    returned as int again, but ints beyond 2**53 lose precision. A single
+    float value makes all values floats.
+    """
+
+    bucket_queue_max_weight = 1000  # shortest_path uses a bucket queue for int weights from 0 to this value.
+
+    def __init__(self, graph):
+        """
+        :param graph: instance of BasicGraph
+        """
+        assert isinstance(graph, BasicGraph)
+        self._graph_class = graph.__class__
+        self._node_ids = tuple(graph.nodes())
+        self._objects = tuple(graph.node(n) for n in self._node_ids)
+        self._index = {n: i for i, n in enumerate(self._node_ids)}
+        self._int_weights = True
+
+        self._offsets, self._targets, self._weights = array('l', [0]), array('l'), array('d')
+        self._r_offsets, self._r_sources, self._r_weights = array('l', [0]), array('l'), array('d')
+        for n in self._node_ids:
+            for n2, d in graph._edges.get(n, {}).items():
+                self._targets.append(self._index[n2])
+                self._weights.append(d)
+                if not isinstance(d, int) or isinstance(d, bool):
+                    self._int_weights = False
+            self._offsets.append(len(self._targets))
+            for n1, d in graph._reverse_edges.get(n, {}).items():
+                self._r_sources.append(self._index[n1])
+                self._r_weights.append(d)
+            self._r_offsets.append(len(self._r_sources))
+        self._bucket_queue = self._int_weights and all(
+            0 <= d <= self.bucket_queue_max_weight for d in self._weights)
+
+    def __getitem__(self, item):
+        raise ValueError("Use g.node(n1) or g.edge(n1,n2)")
+
+    def __setitem__(self, key, value):
+        raise ValueError("FrozenGraph is immutable. Use g.thaw()")
+
+    def __delitem__(self, key):
+        raise ValueError("FrozenGraph is immutable. Use g.thaw()")
+
+    def __contains__(self, item):
+        """
+        :returns bool: True if node in Graph.
+        """
+        return item in self._index
+
+    def __len__(self):
+        raise ValueError("Use len(g.nodes()) or len(g.edges())")
+
+    def add_edge(self, *args, **kwargs):
+        raise ValueError("FrozenGraph is immutable. Use g.thaw()")
+
+    def del_edge(self, *args, **kwargs):
+        raise ValueError("FrozenGraph is immutable. Use g.thaw()")
+
+    def add_node(self, *args, **kwargs):
+        raise ValueError("FrozenGraph is immutable. Use g.thaw()")
+
+    def del_node(self, *args, **kwargs):
+        raise ValueError("FrozenGraph is immutable. Use g.thaw()")
+
+    def _value(self, d):
+        """ converts a stored weight back to the type it was given as. """
+        return int(d) if self._int_weights else d
+
+    def thaw(self):
+        """ Creates a mutable graph from the snapshot.
+        :return: Graph (or the subclass that was frozen)
+        """
+        g = object.__new__(self._graph_class)
+        g.__init__()
+        for n, obj in zip(self._node_ids, self._objects):
+            g.add_node(n, obj)
+        for n1, n2, d in self.edges():
+            g.add_edge(n1, n2, d)
+        return g
+
+    def node(self, node_id):
+        """
+        Retrieves the node object
+
+        :param node_id: id of node in graph.
+        :return: node object
+        """
+        i = self._index.get(node_id, None)
+        if i is None:
+            return None
+        return self._objects[i]
+
+    def nodes(self, from_node=None, to_node=None, in_degree=None, out_degree=None):
+        """
+        :param from_node (optional) return nodes with edges from 'from_node'
+        :param to_node (optional) returns nodes with edges into 'to_node'
+        :param in_degree (optional) returns nodes with in_degree=N
+        :param out_degree (optional) returns nodes with out_degree=N
+
+        :return list of node ids.
+        """
+        inputs = sum([1 for i in (from_node, to_node, in_degree, out_degree) if i is not None])
+        if inputs > 1:
+            raise ValueError("nodes(...) has too many inputs. Pick one.")
+
+        if inputs == 0:
+            return list(self._node_ids)
+
+        if from_node is not None:
+            i = self._index.get(from_node, None)
+            if i is None:
+                return []
+            return [self._node_ids[j] for j in self._targets[self._offsets[i]:self._offsets[i + 1]]]
+
+        if to_node is not None:
+            i = self._index.get(to_node, None)
+            if i is None:
+                return []
+            return [self._node_ids[j] for j in self._r_sources[self._r_offsets[i]:self._r_offsets[i + 1]]]
+
+        if in_degree is not None:
+            if not isinstance(in_degree, int) or in_degree < 0:
+                raise ValueError("in_degree must be int >= 0")
+            offsets = self._r_offsets
+            return [n for i, n in enumerate(self._node_ids) if offsets[i + 1] - offsets[i] == in_degree]
+
+        if out_degree is not None:
+            if not isinstance(out_degree, int) or out_degree < 0:
+                raise ValueError("out_degree must be int >= 0")
+            offsets = self._offsets
+            return [n for i, n in enumerate(self._node_ids) if offsets[i + 1] - offsets[i] == out_degree]
+
+    def in_degree(self, node):
+        """
+        :param node: node id
+        :return: number of edges into node.
+        """
+        i = self._index.get(node, None)
+        if i is None:
+            return 0
+        return self._r_offsets[i + 1] - self._r_offsets[i]
+
+    def out_degree(self, node):
+        """
+        :param node: node id
+        :return: number of edges from node.
+        """
+        i = self._index.get(node, None)
+        if i is None:
+            return 0
+        return self._offsets[i + 1] - self._offsets[i]
+
+    def edge(self, node1, node2, default=None):
+        """Retrieves the edge (node1, node2)
+
+        :param node1: node id
+        :param node2: node id
+        :param default: returned value if edge doesn't exist.
+        :return: edge(node1,node2)
+        """
+        i, j = self._index.get(node1, None), self._index.get(node2, None)
+        if i is None or j is None:
+            return default
+        for k in range(self._offsets[i], self._offsets[i + 1]):
+            if self._targets[k] == j:
+                return self._value(self._weights[k])
+        return default
+
+    def edges(self, path=None, from_node=None, to_node=None):
+        """
+        :param path (optional) list of nodes for which the edges are wanted.
+        :param from_node (optional) for which outgoing edges are returned.
+        :param to_node (optiona) for which incoming edges are returned.
+        :return list of edges (n1, n2, value)
+        """
+        inputs = sum([1 for i in (from_node, to_node, path) if i is not None])
+        if inputs > 1:
+            raise ValueError("edges(...) has too many inputs. Pick one.")
+
+        if path:
+            if not isinstance(path, list):
+                raise ValueError("expects a list")
+            if len(path) < 2:
+                raise ValueError("path of length 1 is not a path.")
+            edges = [(path[ix], path[ix + 1], self.edge(path[ix], path[ix + 1])) for ix in range(len(path) - 1)]
+            for n1, n2, d in edges:
+                if d is None:
+                    raise KeyError((n1, n2))
+            return edges
+
+        nodes, value = self._node_ids, self._value
+        if from_node:
+            i = self._index.get(from_node, None)
+            if i is None:
+                return []
+            return [(from_node, nodes[self._targets[k]], value(self._weights[k]))
+                    for k in range(self._offsets[i], self._offsets[i + 1])]
+
+        if to_node:
+            i = self._index.get(to_node, None)
+            if i is None:
+                return []
+            return [(nodes[self._r_sources[k]], to_node, value(self._r_weights[k]))
+                    for k in range(self._r_offsets[i], self._r_offsets[i + 1])]
+
+        return [(nodes[i], nodes[self._targets[k]], value(self._weights[k]))
+                for i in range(len(nodes))
+                for k in range(self._offsets[i], self._offsets[i + 1])]
+
+    def to_dict(self):
+        """ creates a nested dictionary from the graph.
+        :return dict d[n1][n2] = distance
+        """
+        d = {n: {} for n in self._node_ids}
+        for n1, n2, dist in self.edges():
+            d[n1][n2] = dist
+        return d
+
+    def to_list(self):
+        """ returns list of edges and nodes."""
+        return self.edges() + [(i,) for i in self._node_ids]
+
+    def is_connected(self, n1, n2):
+        """ helper determining if two nodes are connected using BFS. """
+        return self.breadth_first_search(n1, n2)[1] != []
+
+    def shortest_path(self, start, end, weights=None):
+        """
+        :param start: start node
+        :param end: end node
+        :param weights: None or 'int'. The snapshot uses a bucket queue by
+                        itself if all edge values are small ints >= 0. 'int'
+                        uses it for any ints >= 0, and raises ValueError if
+                        another edge value is found.
+        :return: distance, path as list
+        """
+        if weights not in (None, 'int'):
+            raise ValueError(f"expected weights to be None or 'int', not {weights}")
+        if weights == 'int' and not self._int_weights:
+            raise ValueError("expected all edge values to be ints >= 0")
+        s, e = self._index.get(start, None), self._index.get(end, None)
+        if s is None or e is None:
+            return float('inf'), []
+        if self._bucket_queue or weights == 'int':
+            return self._shortest_path_buckets(s, e)
+        offsets, targets, weights = self._offsets, self._targets, self._weights
+
+        q, visited, mins, parents = [(0, s)], set(), {s: 0}, {s: None}
+        while q:
+            cost, v1 = heappop(q)
+            if v1 in visited:
+                continue
+            visited.add(v1)
+            if v1 == e:  # exit criteria.
+                return self._value(cost), self._path(parents, e)
+
+            for k in range(offsets[v1], offsets[v1 + 1]):
+                v2 = targets[k]
+                if v2 in visited:
+                    continue
+                next_node = cost + weights[k]
+                prev = mins.get(v2, None)
+                if prev is None or next_node < prev:
+                    mins[v2] = next_node
+                    parents[v2] = v1
+                    heappush(q, (next_node, v2))
+        return float("inf"), []
+
+    def _shortest_path_buckets(self, s, e):
+        """ shortest_path using a bucket queue, for small int weights >= 0.
+        :param s: start node index
+        :param e: end node index
+        :return: distance, path as list
+        """
+        offsets, targets, weights = self._offsets, self._targets, self._weights
+
+        def neighbours(v1):
+            return ((targets[k], int(weights[k])) for k in range(offsets[v1], offsets[v1 + 1]))
+
+        cost, path = _shortest_path_buckets(None, s, e, neighbours)
+        return cost, [self._node_ids[v] for v in path]
+
+    def breadth_first_search(self, start, end):
+        """ Determines the path with fewest nodes.
+        :param start: start node
+        :param end: end nodes
+        :return: nodes, path as list
+        """
+        s, e = self._index.get(start, None), self._index.get(end, None)
+        if s is None or e is None:
+            return float('inf'), []
+        offsets, targets = self._offsets, self._targets
+        parents = {s: None}
+        q, depth = [s], 0
+        while q:
+            if e in parents:
+                return depth, self._path(parents, e)
+            new_q = []
+            for v1 in q:
+                for k in range(offsets[v1], offsets[v1 + 1]):
+                    v2 = targets[k]
+                    if v2 not in parents:
+                        parents[v2] = v1
+                        new_q.append(v2)
+            q, depth = new_q, depth + 1
+        return float('inf'), []
+
+    def components(self):
+        """ Determines the (weakly connected) components.
+        :return: list of sets of nodes. Each set is a component.
+        """
+        visited = bytearray(len(self._node_ids))
+        sets_of_components = []
+        start = visited.find(0)
+        while start != -1:
+            reached = []
+            self._bfs(start, undirected=True, visited=visited, reached=reached)
+            sets_of_components.append({self._node_ids[i] for i in reached})
+            start = visited.find(0, start + 1)
+        return sets_of_components
+
+    def network_size(self, n1, degrees_of_separation=None):
+        """ Determines the nodes within the range given by
+        a degree of separation
+        :param n1: start node
+        :param degrees_of_separation: integer
+        :return: set of nodes within given range
+        """
+        assert n1 in self._index
+        if degrees_of_separation is not None:
+            assert isinstance(degrees_of_separation, int)
+        visited, _ = self._bfs(self._index[n1], max_depth=degrees_of_separation)
+        return {self._node_ids[i] for i, v in enumerate(visited) if v}
+
+    def degree_of_separation(self, n1, n2):
+        """ determines the degree of separation between 2 nodes
+        :param n1: node
+        :param n2: node
+        :return: degree
+        """
+        assert n1 in self._index
+        if n2 not in self._index:
+            return float('inf')
+        visited, depth = self._bfs(self._index[n1], end=self._index[n2])
+        return depth
+
+    def _bfs(self, start, max_depth=None, end=None, undirected=False, visited=None, reached=None,
+             direction_optimizing=True):
+        """ Direction optimizing breadth first search (Beamer et al., 2012).
+
+        The search expands the frontier top-down (from the frontier to its
+        neighbours) whilst the frontier is small. When the edges leaving the
+        frontier outnumber the edges left to explore by a factor (1/alpha), it
+        switches to bottom-up sweeps, where each unvisited node scans its
+        incoming edges until it finds a parent in the frontier. It switches
+        back when the frontier has shrunk below n / beta nodes.
+
+        :param start: node index
+        :param max_depth: (optional) int, max number of levels.
+        :param end: (optional) node index. The search stops when end is reached.
+        :param undirected: bool: follow edges in both directions.
+        :param visited: (optional) bytearray of nodes that are excluded from
+                        the search. It is updated in place.
+        :param reached: (optional) list, to which the nodes are appended as they are reached.
+        :param direction_optimizing: bool: False only searches top-down.
+        :return: visited (bytearray), depth of end (or float('inf')) if end is
+                 given, else the number of levels searched.
+        """
+        alpha, beta = 14, 24
+        n = len(self._node_ids)
+        outgoing = [(self._offsets, self._targets)]
+        incoming = [(self._r_offsets, self._r_sources)]
+        if undirected:
+            outgoing = incoming = outgoing + incoming
+        if visited is None:
+            visited = bytearray(n)
+        visited[start] = 1
+        if reached is not None:
+            reached.append(start)
+        unexplored_edges = sum(len(targets) for _, targets in outgoing)
+
+        frontier, depth, bottom_up = [start], 0, False
+        while frontier:
+            if end is not None and visited[end]:
+                return visited, depth
+            if max_depth is not None and depth >= max_depth:
+                break
+
+            if direction_optimizing:
+                frontier_edges = sum(offsets[v + 1] - offsets[v] for v in frontier for offsets, _ in outgoing)
+                unexplored_edges -= frontier_edges
+                if not bottom_up and frontier_edges > unexplored_edges / alpha:
+                    bottom_up = True
+                elif bottom_up and len(frontier) < n / beta:
+                    bottom_up = False
+
+            new_frontier = []
+            if bottom_up:
+                in_frontier = bytearray(n)
+                for v in frontier:
+                    in_frontier[v] = 1
+                is_parent = in_frontier.__getitem__
+                v = visited.find(0)
+                while v != -1:
+                    for offsets, sources in incoming:
+                        if any(map(is_parent, sources[offsets[v]:offsets[v + 1]])):
+                            visited[v] = 1
+                            new_frontier.append(v)
+                            break
+                    v = visited.find(0, v + 1)
+            else:
+                for v1 in frontier:
+                    for offsets, targets in outgoing:
+                        for v2 in targets[offsets[v1]:offsets[v1 + 1]]:
+                            if not visited[v2]:
+                                visited[v2] = 1
+                                new_frontier.append(v2)
+            if reached is not None:
+                reached.extend(new_frontier)
+            frontier = new_frontier
+            depth += 1
+
+        if end is not None:
+            return visited, (depth if visited[end] else float('inf'))
+        return visited, depth
+
+    def _dijkstra(self, start, reverse=False, targets=None):
+        """ single source shortest paths over the node indices.
+        :param start: node index
+        :param reverse: bool: if True the edges are followed backwards, whereby
+                        the distances are those *to* start.
+        :param targets: (optional) set of node indices. The search stops when
+                        all targets have been reached.
+        :return: distances as array('d'), parents as array('l') (-1 for none)
+        """
+        if reverse:
+            offsets, neighbours, weights = self._r_offsets, self._r_sources, self._r_weights
+        else:
+            offsets, neighbours, weights = self._offsets, self._targets, self._weights
+        n = len(self._node_ids)
+        distances = array('d', [float('inf')]) * n
+        parents = array('l', [-1]) * n
+        visited = bytearray(n)
+        distances[start] = 0
+        remaining = None if targets is None else set(targets)
+        q = [(0.0, start)]
+        while q:
+            cost, v1 = heappop(q)
+            if visited[v1]:
+                continue
+            visited[v1] = 1
+            if remaining is not None:
+                remaining.discard(v1)
+                if not remaining:
+                    break
+            for k in range(offsets[v1], offsets[v1 + 1]):
+                v2 = neighbours[k]
+                next_node = cost + weights[k]
+                if next_node < distances[v2]:
+                    distances[v2] = next_node
+                    parents[v2] = v1
+                    heappush(q, (next_node, v2))
+        return distances, parents
+
+    def _path(self, parents, end):
+        """ rebuilds the path to `end` from a map of node index: parent index. """
+        path = []
+        v = end
+        while v is not None:
+            path.append(self._node_ids[v])
+            v = parents[v]
+        path.reverse()
+        return path
@@ -0,0 +1,731 @@
+import copy
+import os
+import pickle
+import random
+import struct
+from array import array
+from collections import deque
+from heapq import heappop, heappush
+
+try:
+    import numpy as np
+    numpy_enabled = True
+except ImportError:
+    numpy_enabled = False
+
+from graph import BasicGraph, FrozenGraph, _worker_pool, _worker_state
+
+DTYPES = ('float32', 'float64')
+MAGIC = b'GRAPHAPSP'  # first bytes of a file with a DistanceMatrix.
+ALIGNMENT = 64  # the matrix starts at a multiple of this offset in the file.
+
+
+class DistanceMatrix(object):
+    """
+    Distances between all pairs of nodes as a dense matrix, where
+    matrix[i][j] is the distance from nodes[i] to nodes[j].
+
+    The matrix can live in a memory mapped file, so that matrices larger
+    than memory are paged in by the operating system on access, and so that
+    other processes can open a precomputed result at no cost:
+
+    >>> dm = g.all_pairs_shortest_paths(method='johnson', filename='apsp.bin')
+    >>> dm = DistanceMatrix.load('apsp.bin')  # in another process.
+
+    Usage:
+    >>> dm = g.all_pairs_shortest_paths(method='numpy')
+    >>> dm.distance(1, 5)
+    >>> dm.row(1)  # {node: distance, ...}
+    >>> dm.column(5)  # {node: distance, ...}
+    >>> dm.minsum()  # [node, ...], reduced in chunks of rows.
+    >>> dm.to_dict()  # {node: {node: distance, ...}, ...} as the default method.
+    """
+
+    def __init__(self, nodes, matrix, int_values=False):
+        """
+        :param nodes: list of nodes in the order of the rows and columns.
+        :param matrix: 2D array with the distances.
+        :param int_values: bool: True if the distances are to be returned as int.
+        """
+        self.nodes = tuple(nodes)
+        self.index = {n: i for i, n in enumerate(self.nodes)}
+        self.matrix = matrix
+        self._int_values = int_values
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def _position(self, node):
+        try:
+            return self.index[node]
+        except KeyError:
+            raise ValueError(f"{node} not in distance matrix")
+
+    def _value(self, d):
+        """ converts a stored distance to the type of the edge values. """
+        return int(d) if self._int_values and d not in (float('inf'), float('-inf')) else float(d)
+
+    def distance(self, n1, n2):
+        """ returns the distance from n1 to n2. """
+        return self._value(self.matrix[self._position(n1), self._position(n2)])
+
+    def row(self, n1):
+        """ returns the distances from n1 as dict {node: distance} """
+        return {n2: self._value(d) for n2, d in zip(self.nodes, self.matrix[self._position(n1)].tolist())}
+
+    def column(self, n2):
+        """ returns the distances to n2 as dict {node: distance} """
+        return {n1: self._value(d) for n1, d in zip(self.nodes, self.matrix[:, self._position(n2)].tolist())}
+
+    def to_dict(self):
+        """ returns the distances as dict {n1: {n2: distance}}, as all_pairs_shortest_paths(). """
+        return {n1: self.row(n1) for n1 in self.nodes}
+
+    def _chunks(self, chunk_size):
+        """ generates (first row, block of rows) with chunk_size rows per block. """
+        size = len(self.nodes)
+        if chunk_size is None:
+            row_bytes = max(1, size * self.matrix.dtype.itemsize)
+            chunk_size = max(1, 2 ** 24 // row_bytes)  # 16 Mb per block.
+        elif not isinstance(chunk_size, int) or chunk_size < 1:
+            raise ValueError(f"expected chunk_size to be int >= 1, not {chunk_size}")
+        for start in range(0, size, chunk_size):
+            yield start, self.matrix[start:start + chunk_size]
+
+    def _reduce(self, reduction, chunk_size):
+        """ returns the nodes with the smallest reduction of their row. """
+        values = np.empty(len(self.nodes), dtype='float64')
+        for start, rows in self._chunks(chunk_size):
+            values[start:start + len(rows)] = reduction(rows.astype('float64', copy=False), axis=1)
+        if not len(values):
+            return []
+        smallest = values.min()
+        return [self.nodes[i] for i in np.flatnonzero(values == smallest).tolist()]
+
+    def minsum(self, chunk_size=None):
+        """ returns the node(s) with the smallest sum of distances to all other nodes.
+        :param chunk_size: int: rows per block read from the matrix, or None for ~16 Mb.
+        """
+        return self._reduce(np.sum, chunk_size)
+
+    def minmax(self, chunk_size=None):
+        """ returns the node(s) with the smallest maximum distance to all other nodes.
+        :param chunk_size: int: rows per block read from the matrix, or None for ~16 Mb.
+        """
+        return self._reduce(np.max, chunk_size)
+
+    @classmethod
+    def create(cls, filename, nodes, dtype='float64', int_values=False):
+        """ Creates a memory mapped matrix of inf, in a file with a header
+        that has the nodes in the order of the rows and columns.
+
+        :param filename: str or pathlib.Path. An existing file is overwritten.
+        :param nodes: list of nodes.
+        :param dtype: 'float64' or 'float32'.
+        :param int_values: bool: True if the distances are to be returned as int.
+        :return: DistanceMatrix
+        """
+        if not numpy_enabled:
+            raise ImportError("DistanceMatrix.create requires numpy")
+        if dtype not in DTYPES:
+            raise ValueError(f"expected dtype to be one of {DTYPES}, not {dtype}")
+        nodes = tuple(nodes)
+        header = pickle.dumps({'nodes': nodes, 'dtype': dtype, 'int_values': int_values},
+                              protocol=pickle.HIGHEST_PROTOCOL)
+        offset = len(MAGIC) + 8 + len(header)
+        offset += -offset % ALIGNMENT
+        with open(str(filename), 'wb') as fo:
+            fo.write(MAGIC + struct.pack('<Q', offset) + header)
+            fo.write(bytes(offset - fo.tell()))
+        shape = (len(nodes), len(nodes))
+        if not nodes:
+            return cls(nodes, np.empty(shape, dtype=dtype), int_values)
+        matrix = np.memmap(str(filename), dtype=dtype, mode='r+', offset=offset, shape=shape)
+        matrix[:] = np.inf
+        return cls(nodes, matrix, int_values)
+
+    @classmethod
+    def load(cls, filename, mode='r'):
+        """ Opens a matrix stored with `save` or `create`, memory mapped,
+        whereby only the rows used are read from disk.
+
+        Only load files from trusted sources, as the header is read using pickle.
+
+        :param filename: str or pathlib.Path
+        :param mode: 'r' for read only or 'r+' to update the file.
+        :return: DistanceMatrix
+        """
+        if not numpy_enabled:
+            raise ImportError("DistanceMatrix.load requires numpy")
+        if mode not in ('r', 'r+'):
+            raise ValueError(f"expected mode to be 'r' or 'r+', not {mode}")
+        with open(str(filename), 'rb') as fi:
+            if fi.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{filename} is not a distance matrix.")
+            offset, = struct.unpack('<Q', fi.read(8))
+            header = pickle.load(fi)
+        nodes = header['nodes']
+        shape = (len(nodes), len(nodes))
+        if not nodes:
+            return cls(nodes, np.empty(shape, dtype=header['dtype']), header['int_values'])
+        matrix = np.memmap(str(filename), dtype=header['dtype'], mode=mode, offset=offset, shape=shape)
+        return cls(nodes, matrix, header['int_values'])
+
+    def save(self, filename):
+        """ Stores the matrix in a file that `load` memory maps.
+        :param filename: str or pathlib.Path
+        """
+        dtype = self.matrix.dtype.name
+        stored = DistanceMatrix.create(filename, self.nodes, dtype=dtype, int_values=self._int_values)
+        for start, rows in self._chunks(None):
+            stored.matrix[start:start + len(rows)] = rows
+        stored.flush()
+
+    def flush(self):
+        """ writes changes of a memory mapped matrix to disk. """
+        if isinstance(self.matrix, np.memmap):
+            self.matrix.flush()
+
+
+class PredecessorMatrix(object):
+    """
+    Shortest path trees of all nodes, where matrix[i * len(nodes) + j] is the
+    index of the node before nodes[j] on the shortest path from nodes[i],
+    or -1 if there is no such node.
+
+    Usage:
+    >>> distances, paths = g.all_pairs_shortest_paths(paths=True)
+    >>> paths.path(1, 5)  # [1, 3, 5] without further search.
+    """
+
+    def __init__(self, nodes, matrix):
+        """
+        :param nodes: list of nodes in the order of the rows and columns.
+        :param matrix: flat sequence of len(nodes) ** 2 node indices,
+                       row by row, such as array('l') or a numpy array.
+        """
+        self.nodes = tuple(nodes)
+        self.index = {n: i for i, n in enumerate(self.nodes)}
+        if len(matrix) != len(self.nodes) ** 2:
+            raise ValueError(f"expected {len(self.nodes) ** 2} predecessors, not {len(matrix)}")
+        self.matrix = matrix
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def _position(self, node):
+        try:
+            return self.index[node]
+        except KeyError:
+            raise ValueError(f"{node} not in predecessor matrix")
+
+    def predecessor(self, n1, n2):
+        """ returns the node before n2 on the shortest path from n1, or None. """
+        i, j = self._position(n1), self._position(n2)
+        p = int(self.matrix[i * len(self.nodes) + j])
+        return None if p == -1 else self.nodes[p]
+
+    def path(self, n1, n2):
+        """ returns the shortest path from n1 to n2 as a list of nodes,
+        or [] if n2 can't be reached from n1. """
+        i, j = self._position(n1), self._position(n2)
+        size, matrix = len(self.nodes), self.matrix
+        row = i * size
+        path = [j]
+        while j != i:
+            j = int(matrix[row + j])
+            if j == -1:
+                return []
+            path.append(j)
+            if len(path) > size:
+                raise ValueError("the graph has a negative cycle.")
+        path.reverse()
+        return [self.nodes[k] for k in path]
+
+
+def floyd_warshall(graph, dtype='float64', block_size=None, paths=False, filename=None):
+    """ Floyd-Warshall all pairs shortest paths on a dense numpy matrix.
+
+    Each pivot k is a single vectorised update of the matrix:
+
+        D = minimum(D, D[:, k] + D[k, :])
+
+    With block_size, the pivots are processed in blocks of block_size. The
+    rows and columns of the block are updated first, whereafter each tile of
+    block_size rows receives all the pivots of the block whilst the tile is
+    in cache, instead of streaming the full matrix through memory per pivot.
+
+    :param graph: instance of Graph
+    :param dtype: 'float64' or 'float32'. float32 halves the memory
+                  footprint at the cost of precision.
+    :param block_size: int or None.
+    :param paths: bool: if True the predecessors are updated alongside the
+                  distances, which roughly doubles the work per pivot.
+    :param filename: str or pathlib.Path: if given, the matrix is memory
+                     mapped to this file, see DistanceMatrix.load.
+    :return: DistanceMatrix, or (DistanceMatrix, PredecessorMatrix) with paths.
+    """
+    if not numpy_enabled:
+        raise ImportError("floyd_warshall requires numpy")
+    assert isinstance(graph, BasicGraph)
+    if dtype not in DTYPES:
+        raise ValueError(f"expected dtype to be one of {DTYPES}, not {dtype}")
+    if block_size is not None and (not isinstance(block_size, int) or block_size < 1):
+        raise ValueError(f"expected block_size to be int >= 1, not {block_size}")
+
+    nodes = graph.nodes()
+    index = {n: i for i, n in enumerate(nodes)}
+    size = len(nodes)
+    rows, columns, values = [], [], []
+    for n1, n2, d in graph.edges():
+        rows.append(index[n1])
+        columns.append(index[n2])
+        values.append(d)
+    int_values = all(isinstance(d, int) for d in values)
+    if filename is None:
+        distances = DistanceMatrix(nodes, np.full((size, size), np.inf, dtype=dtype), int_values)
+    else:
+        distances = DistanceMatrix.create(filename, nodes, dtype=dtype, int_values=int_values)
+    matrix = distances.matrix
+    matrix[rows, columns] = values
+    np.fill_diagonal(matrix, 0)
+    predecessors = None
+    if paths:
+        predecessors = np.full((size, size), -1, dtype='int32' if size < 2 ** 31 else 'int64')
+        predecessors[rows, columns] = rows
+        np.fill_diagonal(predecessors, -1)
+
+    if block_size is None:
+        everything = slice(None)
+        for k in range(size):
+            _pivot(matrix, predecessors, k, everything, everything)
+    else:
+        _blocked(matrix, predecessors, block_size)
+    distances.flush()
+    if paths:
+        return distances, PredecessorMatrix(nodes, predecessors.ravel())
+    return distances
+
+
+def _pivot(matrix, predecessors, k, rows, columns):
+    """ relaxes matrix[rows, columns] over pivot k, in place. """
+    block = matrix[rows, columns]
+    candidate = matrix[rows, k, None] + matrix[None, k, columns]
+    if predecessors is None:
+        np.minimum(block, candidate, out=block)
+        return
+    shorter = candidate < block
+    np.copyto(block, candidate, where=shorter)
+    np.copyto(predecessors[rows, columns], predecessors[None, k, columns], where=shorter)
+
+
+def _blocked(matrix, predecessors, block_size):
+    """ blocked (tiled) Floyd-Warshall, in place. """
+    size = len(matrix)
+    everything = slice(None)
+    for kb in range(0, size, block_size):
+        ke = min(kb + block_size, size)
+        block = slice(kb, ke)
+        # 1. the rows and columns of the block, with the pivots in order.
+        for k in range(kb, ke):
+            _pivot(matrix, predecessors, k, block, everything)
+            _pivot(matrix, predecessors, k, everything, block)
+        # 2. the remaining rows, one tile at a time.
+        for ib in range(0, size, block_size):
+            if ib == kb:
+                continue
+            tile = slice(ib, ib + block_size)
+            for k in range(kb, ke):
+                _pivot(matrix, predecessors, k, tile, everything)
+
+
+def floyd_warshall_paths(graph):
+    """ Floyd-Warshall all pairs shortest paths without numpy, which keeps
+    the predecessors as it goes.
+
+    :param graph: instance of Graph
+    :return: dict {n1: {n2: distance}}, PredecessorMatrix
+    """
+    assert isinstance(graph, BasicGraph)
+    nodes = graph.nodes()
+    index = {n: i for i, n in enumerate(nodes)}
+    size, inf = len(nodes), float('inf')
+    distances = [[inf] * size for _ in range(size)]
+    predecessors = [array('l', [-1]) * size for _ in range(size)]
+    for n1, n2, d in graph.edges():
+        i, j = index[n1], index[n2]
+        if i != j:
+            distances[i][j] = d
+            predecessors[i][j] = i
+    for i in range(size):
+        distances[i][i] = 0
+
+    for k in range(size):
+        row_k, predecessors_k = distances[k], predecessors[k]
+        for i in range(size):
+            row_i = distances[i]
+            d_ik = row_i[k]
+            if d_ik == inf:
+                continue
+            predecessors_i = predecessors[i]
+            for j in range(size):
+                d = d_ik + row_k[j]
+                if d < row_i[j]:
+                    row_i[j] = d
+                    predecessors_i[j] = predecessors_k[j]
+
+    matrix = array('l')
+    for row in predecessors:
+        matrix.extend(row)
+    return ({n1: dict(zip(nodes, row)) for n1, row in zip(nodes, distances)},
+            PredecessorMatrix(nodes, matrix))
+
+
+def johnson(graph, workers=None, paths=False):
+    """ Johnson's all pairs shortest paths for sparse graphs, as a stream of rows.
+
+    1. A Bellman-Ford pass from a virtual node with a zero edge to every node
+       determines a potential h(v) for each node, whereby each edge (u, v, d)
+       can be reweighted to d + h(u) - h(v) >= 0. Graphs without negative
+       edges skip this step.
+    2. One Dijkstra search per source runs on the reweighted graph, spread
+       over a pool of processes that each receive the graph once.
+
+    Rows are generated in the order of graph.nodes() as they complete, with
+    only a few rows ahead in flight, so the distance matrix is never held
+    in memory as a whole.
+
+    :param graph: instance of Graph
+    :param workers: int: number of processes. None uses all cores.
+                    1 runs all searches in this process.
+    :param paths: bool: if True each row also has the predecessors on the
+                  shortest path tree of the node, as array('l') of node
+                  indices in the order of graph.nodes(), -1 for none.
+    :return: generator of (node, {node: distance}), or of
+             (node, {node: distance}, predecessors) with paths.
+             Raises ValueError if the graph has a negative cycle.
+    """
+    frozen, potential, workers = _prepare(graph, workers)
+    return _johnson(frozen, potential, workers, paths)
+
+
+def _prepare(graph, workers):
+    """ returns the reweighted graph, the potentials and the number of workers for Johnson's algorithm. """
+    assert isinstance(graph, BasicGraph)
+    if workers is not None and (not isinstance(workers, int) or workers < 1):
+        raise ValueError(f"expected workers to be int >= 1, not {workers}")
+    frozen = FrozenGraph(graph)
+    potential = _potentials(frozen)
+    if potential is not None:
+        frozen = _reweighted(frozen, potential)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return frozen, potential, workers
+
+
+def _johnson(frozen, potential, workers, paths):
+    """ generator for johnson, which validates the inputs. """
+    nodes, inf = frozen._node_ids, float('inf')
+    int_weights = frozen._int_weights
+    for i, (distances, parents) in _rows(frozen, potential, workers, paths):
+        if int_weights:
+            row = {n: d if d == inf else int(d) for n, d in zip(nodes, distances)}
+        else:
+            row = dict(zip(nodes, distances))
+        if paths:
+            yield nodes[i], row, parents
+        else:
+            yield nodes[i], row
+
+
+def johnson_paths(graph, workers=None):
+    """ Johnson's all pairs shortest paths with the predecessors.
+
+    :param graph: instance of Graph
+    :param workers: int: number of processes. None uses all cores.
+    :return: dict {n1: {n2: distance}}, PredecessorMatrix
+    """
+    distances, matrix = {}, array('l')
+    for n, row, parents in johnson(graph, workers=workers, paths=True):
+        distances[n] = row
+        matrix.extend(parents)
+    return distances, PredecessorMatrix(graph.nodes(), matrix)
+
+
+def johnson_matrix(graph, workers=None, paths=False, dtype='float64', filename=None):
+    """ Johnson's all pairs shortest paths, with the rows written to a
+    DistanceMatrix as they complete.
+
+    :param graph: instance of Graph
+    :param workers: int: number of processes. None uses all cores.
+    :param paths: bool: if True the predecessors are returned as well.
+    :param dtype: 'float64' or 'float32'.
+    :param filename: str or pathlib.Path: if given, the matrix is memory
+                     mapped to this file, see DistanceMatrix.load.
+    :return: DistanceMatrix, or (DistanceMatrix, PredecessorMatrix) with paths.
+    """
+    if not numpy_enabled:
+        raise ImportError("johnson_matrix requires numpy")
+    if dtype not in DTYPES:
+        raise ValueError(f"expected dtype to be one of {DTYPES}, not {dtype}")
+    frozen, potential, workers = _prepare(graph, workers)
+    nodes = frozen._node_ids
+    size = len(nodes)
+    if filename is None:
+        distances = DistanceMatrix(nodes, np.empty((size, size), dtype=dtype), frozen._int_weights)
+    else:
+        distances = DistanceMatrix.create(filename, nodes, dtype=dtype, int_values=frozen._int_weights)
+    predecessors = array('l')
+    for i, (row, parents) in _rows(frozen, potential, workers, paths):
+        distances.matrix[i] = np.frombuffer(row, dtype='float64')
+        if paths:
+            predecessors.extend(parents)
+    distances.flush()
+    if paths:
+        return distances, PredecessorMatrix(nodes, predecessors)
+    return distances
+
+
+def _rows(frozen, potential, workers, paths):
+    """ generates (node index, (distances, parents)) for all nodes in order of index. """
+    size = len(frozen._node_ids)
+    if workers == 1 or size < 2:
+        for i in range(size):
+            yield i, _row(i, paths, frozen, potential)
+        return
+
+    pool = _worker_pool(workers, frozen, potential)
+    pending = deque()
+    try:
+        sources = iter(range(size))
+        for i in sources:
+            pending.append((i, pool.submit(_row, i, paths)))
+            if len(pending) == workers * 4:
+                break
+        while pending:
+            i, future = pending.popleft()
+            j = next(sources, None)
+            if j is not None:
+                pending.append((j, pool.submit(_row, j, paths)))
+            yield i, future.result()
+    finally:
+        for _, future in pending:  # shutdown(cancel_futures=True) requires python 3.9
+            future.cancel()
+        pool.shutdown()
+
+
+def _potentials(frozen):
+    """ Bellman-Ford potentials for Johnson's reweighting.
+    :return: list of potentials by node index, or None if no edge is negative.
+    """
+    weights = frozen._weights
+    if not weights or min(weights) >= 0:
+        return None
+    offsets, targets = frozen._offsets, frozen._targets
+    size = len(frozen._node_ids)
+    potential = [0] * size  # the virtual node reaches every node at distance 0.
+    for _ in range(size + 1):
+        changed = False
+        for u in range(size):
+            h = potential[u]
+            for k in range(offsets[u], offsets[u + 1]):
+                v = targets[k]
+                d = h + weights[k]
+                if d < potential[v]:
+                    potential[v] = d
+                    changed = True
+        if not changed:
+            return potential
+    raise ValueError("the graph has a negative cycle.")
+
+
+def _reweighted(frozen, potential):
+    """ returns a copy of frozen with edge values d + h(u) - h(v) """
+    offsets, targets, weights = frozen._offsets, frozen._targets, frozen._weights
+    r_offsets, sources, r_weights = frozen._r_offsets, frozen._r_sources, frozen._r_weights
+    size = len(frozen._node_ids)
+    reweighted = copy.copy(frozen)
+    reweighted._weights = array('d', (
+        weights[k] + potential[u] - potential[targets[k]]
+        for u in range(size) for k in range(offsets[u], offsets[u + 1])))
+    reweighted._r_weights = array('d', (
+        r_weights[k] + potential[sources[k]] - potential[v]
+        for v in range(size) for k in range(r_offsets[v], r_offsets[v + 1])))
+    return reweighted
+
+
+def _row(i, paths, frozen=None, potential=None):
+    """ distances (and parents if paths) from node index i, undoing the reweighting. """
+    if frozen is None:
+        frozen, potential = _worker_state()
+    distances, parents = frozen._dijkstra(i)
+    if potential is not None:
+        h = potential[i]
+        distances = array('d', (d - h + potential[j] for j, d in enumerate(distances)))
+    return distances, (parents if paths else None)
+
+
+OBJECTIVES = ('sum', 'max')
+
+
+def facility_location(graph, objective='sum', workers=1, sample=None, seed=None):
+    """ Finds the node(s) with the smallest sum (minsum) or maximum (minmax)
+    of distances to all other nodes, without the all pairs distance matrix.
+
+    Exact: one Dijkstra search per source, hubs first, which is abandoned as
+    soon as a lower bound of the sum or max exceeds the best value found so
+    far. Nodes are settled in order of distance d, so every node that is not
+    yet settled is at least d away. The sources are spread over a pool of
+    processes in batches, each of which starts from the best value so far.
+
+    Sampling: searches to and from `sample` random nodes s bound the value of
+    every node v by the triangle inequality:
+
+        sum(v) <= n * d(v, s) + sum(s)      max(v) <= d(v, s) + max(s)
+        sum(v) >= sum(s) - n * d(s, v)      max(v) >= max(s) - d(s, v)
+
+    The node(s) with the smallest upper bound are returned, together with an
+    error bound: their value exceeds the optimum by at most this amount.
+
+    :param graph: instance of Graph
+    :param objective: 'sum' or 'max'
+    :param workers: int: number of processes for the exact mode. None uses all cores.
+    :param sample: int: number of sampled nodes, or None for the exact answer.
+    :param seed: (sample) seed for the random choice of nodes.
+    :return: list of nodes, or (list of nodes, error bound) with sample.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"expected objective to be one of {OBJECTIVES}, not {objective}")
+    if sample is not None and (not isinstance(sample, int) or sample < 1):
+        raise ValueError(f"expected sample to be int >= 1, not {sample}")
+    frozen, potential, workers = _prepare(graph, workers)
+    if not frozen._node_ids:
+        return ([], 0) if sample is not None else []
+    if sample is not None:
+        return _sampled(frozen, potential, objective, sample, seed)
+
+    size = len(frozen._node_ids)
+    offsets = frozen._offsets
+    order = sorted(range(size), key=lambda i: offsets[i] - offsets[i + 1])  # hubs first.
+    values = {}
+    best = float('inf')
+    if workers == 1 or size < 2:
+        for i in order:
+            value = _bounded_search(i, objective, best, frozen, potential)
+            if value is not None:
+                values[i] = value
+                best = min(best, value)
+    else:
+        values[order[0]] = best = _bounded_search(order[0], objective, best, frozen, potential)
+        batch_size = max(1, (size - 1) // (workers * 8))
+        batches = iter([order[k:k + batch_size] for k in range(1, size, batch_size)])
+        pool = _worker_pool(workers, frozen, potential)
+        pending = deque()
+        try:
+            for batch in batches:
+                pending.append(pool.submit(_bounded_batch, batch, objective, best))
+                if len(pending) == workers * 2:
+                    break
+            while pending:
+                for i, value in pending.popleft().result():
+                    values[i] = value
+                    best = min(best, value)
+                batch = next(batches, None)
+                if batch is not None:
+                    pending.append(pool.submit(_bounded_batch, batch, objective, best))
+        finally:
+            for future in pending:  # shutdown(cancel_futures=True) requires python 3.9
+                future.cancel()
+            pool.shutdown()
+    return [frozen._node_ids[i] for i in sorted(values) if values[i] == best]
+
+
+def _bounded_batch(sources, objective, best):
+    """ runs _bounded_search in a worker process for a batch of sources.
+    :return: list of (source, value) for the searches that weren't abandoned.
+    """
+    frozen, potential = _worker_state()
+    results = []
+    for i in sources:
+        value = _bounded_search(i, objective, best, frozen, potential)
+        if value is not None:
+            results.append((i, value))
+            best = min(best, value)
+    return results
+
+
+def _bounded_search(i, objective, best, frozen, potential):
+    """ Dijkstra search from node index i, which is abandoned when the sum or
+    max of the distances from i is certain to exceed best.
+    :return: the sum or max of the distances, or None if abandoned.
+    """
+    offsets, targets, weights = frozen._offsets, frozen._targets, frozen._weights
+    size, inf = len(frozen._node_ids), float('inf')
+    h = potential if potential is not None else [0] * size
+    h_i, h_min, unsettled_h = h[i], min(h), sum(h)
+    # the slack keeps ties, should the bounds round differently from the values.
+    limit = best + abs(best) * 1e-9
+    distances = array('d', [inf]) * size
+    visited = bytearray(size)
+    distances[i] = 0
+    settled, remaining = (0 if objective == 'sum' else -inf), size
+    q = [(0.0, i)]
+    while q:
+        cost, v1 = heappop(q)
+        if visited[v1]:
+            continue
+        visited[v1] = 1
+        remaining -= 1
+        # the distances are those of the reweighted graph, see johnson.
+        if objective == 'sum':
+            settled += cost - h_i + h[v1]
+            unsettled_h -= h[v1]
+            bound = settled + remaining * (cost - h_i) + unsettled_h
+        else:
+            settled = max(settled, cost - h_i + h[v1])
+            bound = max(settled, cost - h_i + h_min) if remaining else settled
+        if bound > limit:
+            return None
+        for k in range(offsets[v1], offsets[v1 + 1]):
+            v2 = targets[k]
+            d = cost + weights[k]
+            if d < distances[v2]:
+                distances[v2] = d
+                heappush(q, (d, v2))
+    if remaining:
+        return inf
+    row = (d - h_i + h[j] for j, d in enumerate(distances))
+    value = sum(row) if objective == 'sum' else max(row)
+    return int(value) if frozen._int_weights else value
+
+
+def _sampled(frozen, potential, objective, sample, seed):
+    """ the sampling mode of facility_location. """
+    size, inf = len(frozen._node_ids), float('inf')
+    h = potential if potential is not None else [0] * size
+    reduction = sum if objective == 'sum' else max
+    n = size if objective == 'sum' else 1  # the factor of d in the bounds.
+    upper, lower = [inf] * size, [-inf] * size
+    for s in random.Random(seed).sample(range(size), min(sample, size)):
+        forward, _ = frozen._dijkstra(s)
+        backward, _ = frozen._dijkstra(s, reverse=True)
+        forward = [d - h[s] + h[j] for j, d in enumerate(forward)]  # d(s, j)
+        backward = [d - h[j] + h[s] for j, d in enumerate(backward)]  # d(j, s)
+        value = reduction(forward)
+        upper[s] = lower[s] = value
+        for v in range(size):
+            d_vs, d_sv = backward[v], forward[v]
+            if d_vs != inf:
+                upper[v] = min(upper[v], n * d_vs + value)
+                if objective == 'max':
+                    lower[v] = max(lower[v], d_vs)
+            else:  # then max(v) is inf.
+                lower[v] = inf
+            if d_sv != inf:
+                lower[v] = max(lower[v], value - n * d_sv)
+    best = min(upper)
+    optimum = min(lower)
+    error = 0 if best == optimum else best - optimum
+    if frozen._int_weights:
+        error = error if error == inf else int(error)
+    return [frozen._node_ids[v] for v in range(size) if upper[v] == best], error
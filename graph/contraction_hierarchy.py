@@ -0,0 +1,289 @@
+import hashlib
+import pickle
+from heapq import heappop, heappush
+
+from graph import BasicGraph
+
+
+class ContractionHierarchy(object):
+    """
+    A contraction hierarchy (CH) answers repeated shortest path queries on a
+    static graph in a fraction of the time of a full Dijkstra search.
+
+    Preprocessing contracts the nodes one at a time, least important first.
+    When a node is removed, a shortcut edge is added between each pair of its
+    neighbours whose shortest path ran through it. Each node is thereby given
+    a rank, and a query only has to search upwards in rank from the start
+    and - backwards - from the end, until the two searches meet.
+
+    Usage:
+    >>> ch = g.build_contraction_hierarchy()
+    >>> distance, path = ch.query(start, end)
+    >>> ch.save('network.ch')
+    >>> ch = ContractionHierarchy.load('network.ch', graph=g)
+
+    If the graph is changed after preprocessing, `query` raises ValueError,
+    unless the hierarchy was created with `auto_rebuild=True`.
+    """
+
+    witness_search_limit = 50  # max nodes settled when looking for a path that makes a shortcut redundant.
+
+    def __init__(self, graph, auto_rebuild=False):
+        """
+        :param graph: instance of Graph (edge values must be >= 0)
+        :param auto_rebuild: bool: rebuild on query if the graph has changed.
+        """
+        assert isinstance(graph, BasicGraph)
+        self._graph = graph
+        self.auto_rebuild = auto_rebuild
+        self._version = None
+        self._fingerprint = None
+        self._node_ids = ()
+        self._index = {}
+        self._upward = []  # upward[i] = [(j, distance), ...] edges to nodes of higher rank.
+        self._downward = []  # downward[i] = [(j, distance), ...] reversed edges from nodes of higher rank.
+        self._middle = {}  # (i, j): k, for the shortcut i -> k -> j.
+        self.rebuild()
+
+    @property
+    def stale(self):
+        """ True if the graph has changed since the hierarchy was built. """
+        return self._graph is None or self._graph._version != self._version
+
+    def rebuild(self):
+        """ (re)builds the hierarchy from the graph. """
+        if self._graph is None:
+            raise ValueError("No graph to build from. Use ContractionHierarchy.load(filename, graph)")
+        graph = self._graph
+        self._node_ids = tuple(graph.nodes())
+        self._index = {n: i for i, n in enumerate(self._node_ids)}
+        size = len(self._node_ids)
+
+        out = [{} for _ in range(size)]  # the remaining (not contracted) graph.
+        inc = [{} for _ in range(size)]
+        for n1, n2, d in graph.edges():
+            if d < 0:
+                raise ValueError(f"edge ({n1}, {n2}) has negative value {d}")
+            i, j = self._index[n1], self._index[n2]
+            if i != j:
+                out[i][j] = d
+                inc[j][i] = d
+        edges = {(i, j): d for i in range(size) for j, d in out[i].items()}  # all edges incl. shortcuts.
+        middle = {}
+
+        # 1. order the nodes by importance, with lazy updates.
+        contracted_neighbours = [0] * size
+        q = [(self._importance(i, out, inc, contracted_neighbours), i) for i in range(size)]
+        q.sort()
+        rank = [0] * size
+        level = 0
+        while q:
+            _, i = heappop(q)
+            importance = self._importance(i, out, inc, contracted_neighbours)
+            if q and importance > q[0][0]:
+                heappush(q, (importance, i))
+                continue
+
+            # 2. contract node i.
+            for u, w, d in self._shortcuts(i, out, inc):
+                out[u][w] = d
+                inc[w][u] = d
+                edges[(u, w)] = d
+                middle[(u, w)] = i
+            for u in inc[i]:
+                del out[u][i]
+                contracted_neighbours[u] += 1
+            for w in out[i]:
+                del inc[w][i]
+                contracted_neighbours[w] += 1
+            out[i], inc[i] = {}, {}
+            rank[i] = level
+            level += 1
+
+        # 3. split the edges into the upward and downward search graphs.
+        upward = [[] for _ in range(size)]
+        downward = [[] for _ in range(size)]
+        for (i, j), d in edges.items():
+            if rank[i] < rank[j]:
+                upward[i].append((j, d))
+            else:
+                downward[j].append((i, d))
+
+        self._upward, self._downward, self._middle = upward, downward, middle
+        self._version = graph._version
+        self._fingerprint = fingerprint(graph)
+
+    def _importance(self, i, out, inc, contracted_neighbours):
+        """ edge difference: shortcuts added minus edges removed by contracting i. """
+        return len(self._shortcuts(i, out, inc)) - len(out[i]) - len(inc[i]) + contracted_neighbours[i]
+
+    def _shortcuts(self, i, out, inc):
+        """ determines the shortcuts required to contract node i.
+        :return: list of (u, w, distance)
+        """
+        shortcuts = []
+        for u, d1 in inc[i].items():
+            targets = {w: d1 + d2 for w, d2 in out[i].items() if w != u}
+            if not targets:
+                continue
+            witnesses = self._witness_search(u, i, max(targets.values()), out)
+            for w, d in targets.items():
+                if witnesses.get(w, float('inf')) > d:
+                    shortcuts.append((u, w, d))
+        return shortcuts
+
+    def _witness_search(self, start, excluded, limit, out):
+        """ limited Dijkstra search from start that avoids the excluded node.
+        :return: dict {node: distance} of the distances found.
+        """
+        q, visited, mins = [(0, start)], set(), {start: 0}
+        while q:
+            cost, v1 = heappop(q)
+            if v1 in visited:
+                continue
+            if cost > limit or len(visited) >= self.witness_search_limit:
+                break
+            visited.add(v1)
+            for v2, dist in out[v1].items():
+                if v2 == excluded:
+                    continue
+                next_node = cost + dist
+                if next_node < mins.get(v2, float('inf')):
+                    mins[v2] = next_node
+                    heappush(q, (next_node, v2))
+        return mins
+
+    def query(self, start, end):
+        """ Determines the shortest path from start to end.
+        :param start: start node
+        :param end: end node
+        :return: distance, path (as list),
+                 returns float('inf'), [] if no path exists.
+        """
+        if self.stale:
+            if not self.auto_rebuild:
+                raise ValueError("The graph has changed since the contraction hierarchy was built. Use rebuild()")
+            self.rebuild()
+
+        s, e = self._index.get(start, None), self._index.get(end, None)
+        if s is None or e is None:
+            return float('inf'), []
+        if s == e:
+            return 0, [start]
+
+        adjacency = (self._upward, self._downward)
+        queues = ([(0, s)], [(0, e)])
+        mins = ({s: 0}, {e: 0})
+        parents = ({s: None}, {e: None})
+        visited = (set(), set())
+        best, meeting_point = float('inf'), None
+        side = 1
+        while queues[0] or queues[1]:
+            if queues[1 - side]:
+                side = 1 - side  # alternate direction, whilst both have work.
+            q = queues[side]
+            if q[0][0] >= best:
+                q.clear()  # this direction can't improve the best path.
+                continue
+            cost, v1 = heappop(q)
+            if v1 in visited[side]:
+                continue
+            visited[side].add(v1)
+            if v1 in mins[1 - side] and cost + mins[1 - side][v1] < best:
+                best, meeting_point = cost + mins[1 - side][v1], v1
+
+            for v2, dist in adjacency[side][v1]:
+                next_node = cost + dist
+                if next_node < mins[side].get(v2, float('inf')):
+                    mins[side][v2] = next_node
+                    parents[side][v2] = v1
+                    heappush(q, (next_node, v2))
+
+        if meeting_point is None:
+            return float('inf'), []
+
+        up = []  # start ... meeting point
+        v = meeting_point
+        while v is not None:
+            up.append(v)
+            v = parents[0][v]
+        up.reverse()
+        v = parents[1][meeting_point]
+        down = [meeting_point]  # meeting point ... end
+        while v is not None:
+            down.append(v)
+            v = parents[1][v]
+        hops = up + down[1:]
+
+        path = [hops[0]]
+        for i, j in zip(hops[:-1], hops[1:]):
+            self._unpack(i, j, path)
+        return best, [self._node_ids[i] for i in path]
+
+    def _unpack(self, i, j, path):
+        """ appends the nodes after i on the path i -> j, expanding shortcuts. """
+        stack = [(i, j)]
+        while stack:
+            i, j = stack.pop()
+            k = self._middle.get((i, j), None)
+            if k is None:
+                path.append(j)
+            else:
+                stack.append((k, j))
+                stack.append((i, k))
+
+    def save(self, filename):
+        """ Stores the hierarchy in a file.
+        :param filename: str or pathlib.Path
+        """
+        data = {
+            'node_ids': self._node_ids,
+            'upward': self._upward,
+            'downward': self._downward,
+            'middle': self._middle,
+            'fingerprint': self._fingerprint,
+        }
+        with open(str(filename), 'wb') as fo:
+            pickle.dump(data, fo, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, filename, graph, auto_rebuild=False):
+        """ Loads a hierarchy stored with `save`.
+
+        Only load files from trusted sources, as they are read using pickle.
+
+        :param filename: str or pathlib.Path
+        :param graph: the graph the hierarchy was built from. Raises
+                      ValueError if the graph differs from that graph.
+        :param auto_rebuild: bool: rebuild on query if the graph changes.
+        :return: ContractionHierarchy
+        """
+        assert isinstance(graph, BasicGraph)
+        with open(str(filename), 'rb') as fi:
+            data = pickle.load(fi)
+        if data['fingerprint'] != fingerprint(graph):
+            raise ValueError(f"{filename} was not built from this graph.")
+        ch = object.__new__(cls)
+        ch._graph = graph
+        ch.auto_rebuild = auto_rebuild
+        ch._version = graph._version
+        ch._fingerprint = data['fingerprint']
+        ch._node_ids = data['node_ids']
+        ch._index = {n: i for i, n in enumerate(ch._node_ids)}
+        ch._upward = data['upward']
+        ch._downward = data['downward']
+        ch._middle = data['middle']
+        return ch
+
+
+def fingerprint(graph):
+    """ Generates a sha3_256 hash of the nodes and edges of the graph,
+    which is independent of the order in which they were added.
+    :param graph: instance of Graph
+    :return: str
+    """
+    hash_func = hashlib.sha3_256()
+    nodes = sorted(repr(n) for n in graph.nodes())
+    edges = sorted(repr(e) for e in graph.edges())
+    hash_func.update(bytes("|".join(nodes + edges), 'utf-8'))
+    return hash_func.hexdigest()
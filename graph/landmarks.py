@@ -0,0 +1,244 @@
+import random
+
+from graph import BasicGraph, FrozenGraph, a_star_search, _worker_pool, _worker_state
+
+STRATEGIES = ('random', 'farthest', 'avoid')
+
+
+class LandmarkIndex(object):
+    """
+    Landmark index for goal directed search on any graph (ALT: A*, Landmarks
+    and the Triangle inequality).
+
+    For a handful of landmark nodes L the index stores the distance from L to
+    every node and from every node to L. By the triangle inequality:
+
+        d(v, t) >= d(L, t) - d(L, v)
+        d(v, t) >= d(v, L) - d(t, L)
+
+    The largest of these bounds is an estimate that never exceeds the real
+    distance, and is used as heuristic for A* search.
+
+    Usage:
+    >>> index = g.build_landmark_index(k=8, strategy='avoid')
+    >>> distance, path = g.shortest_path(start, end, landmarks=index)
+    """
+
+    def __init__(self, graph, k=8, strategy='avoid', workers=None, seed=None):
+        """
+        :param graph: instance of Graph (edge values must be >= 0)
+        :param k: int: number of landmarks.
+        :param strategy: str: one of 'random', 'farthest' or 'avoid':
+            random: picks landmarks at random.
+            farthest: picks each landmark as far as possible from the landmarks already picked.
+            avoid: picks each landmark in the region where the current landmarks give the
+                   weakest estimates (Goldberg & Harrelson, 2005).
+        :param workers: int: number of processes used to compute the distances.
+                        None uses all cores. 1 computes them in this process.
+                        'avoid' runs the searches to and from each landmark and
+                        the tree of the next round in parallel. 'farthest' needs
+                        each landmark before it can pick the next, so only the
+                        searches towards the landmarks run in parallel.
+        :param seed: seed for random number generator
+        """
+        assert isinstance(graph, BasicGraph)
+        if not isinstance(k, int) or k < 1:
+            raise ValueError(f"expected k to be int >= 1, not {k}")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"expected strategy to be one of {STRATEGIES}, not {strategy}")
+        if workers is not None and (not isinstance(workers, int) or workers < 1):
+            raise ValueError(f"expected workers to be int >= 1, not {workers}")
+        if any(d < 0 for _, _, d in graph.edges()):
+            raise ValueError("landmarks require edge values >= 0")
+
+        self._graph = graph
+        self._version = graph._version
+        frozen = FrozenGraph(graph)
+        self._index = frozen._index
+        rng = random.Random(seed)
+        k = min(k, len(frozen._node_ids))
+
+        pool = None
+        if workers != 1 and len(frozen._node_ids) > 1:
+            pool = _worker_pool(workers, frozen)
+        try:
+            if strategy == 'random':
+                landmarks, known = rng.sample(range(len(frozen._node_ids)), k), {}
+            elif strategy == 'farthest':
+                landmarks, known = _farthest(frozen, k, rng)
+            else:
+                landmarks, known = _avoid(frozen, k, rng, pool)
+
+            # the searches that weren't needed during the selection run in parallel.
+            tasks = [(i, reverse) for i in landmarks for reverse in (False, True) if (i, reverse) not in known]
+            known.update(zip(tasks, (distances for distances, _ in _searches(frozen, tasks, pool))))
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        self.landmarks = [frozen._node_ids[i] for i in landmarks]
+        self._forward = [known[(i, False)] for i in landmarks]  # forward[j][v] = d(landmark j, v)
+        self._backward = [known[(i, True)] for i in landmarks]  # backward[j][v] = d(v, landmark j)
+
+    @property
+    def stale(self):
+        """ True if the graph has changed since the index was built. """
+        return self._graph._version != self._version
+
+    def heuristic(self, end):
+        """ Creates the heuristic for searches towards `end`.
+        :param end: node
+        :return: callable h(node) that returns the lower bound of the distance from node to end.
+        """
+        t = self._index.get(end, None)
+        if t is None:
+            return lambda n: 0
+        bounds = [(forward, forward[t], backward, backward[t])
+                  for forward, backward in zip(self._forward, self._backward)]
+        index = self._index
+
+        def h(n):
+            v = index.get(n, None)
+            if v is None:
+                return 0
+            best = 0
+            for forward, forward_t, backward, backward_t in bounds:
+                a = forward_t - forward[v]
+                b = backward[v] - backward_t
+                if a > best:  # nan comparisons are False, so inf - inf is ignored.
+                    best = a
+                if b > best:
+                    best = b
+            return best
+
+        return h
+
+    def lower_bound(self, start, end):
+        """ returns the lower bound of the distance from start to end. """
+        return self.heuristic(end)(start)
+
+    def shortest_path(self, start, end):
+        """
+        :param start: start node
+        :param end: end node
+        :return: distance, path (as list),
+                 returns float('inf'), [] if no path exists.
+        """
+        if self.stale:
+            raise ValueError("The graph has changed since the landmark index was built.")
+        return a_star_search(self._graph, start, end, self.heuristic(end))
+
+
+def _search(task):
+    i, reverse = task
+    frozen, = _worker_state()
+    return frozen._dijkstra(i, reverse)
+
+
+def _searches(frozen, tasks, pool):
+    """ runs the Dijkstra searches (node index, reverse) on the pool, if any.
+    :return: list of (distances, parents)
+    """
+    if pool is None or len(tasks) < 2:
+        return [frozen._dijkstra(i, reverse) for i, reverse in tasks]
+    return list(pool.map(_search, tasks))
+
+
+def _farthest(frozen, k, rng):
+    """ picks k landmarks, each as far as possible from the landmarks already picked.
+    Nodes that can't be reached from any landmark count as infinitely far away.
+    :return: list of landmarks, dict {(landmark, False): distances}
+    """
+    n = len(frozen._node_ids)
+    distances, _ = frozen._dijkstra(rng.randrange(n))
+    landmarks, known = [], {}
+    nearest = [float('inf')] * n  # distance from the nearest landmark.
+    while len(landmarks) < k:
+        candidates = [v for v in range(n) if v not in landmarks]
+        scores = nearest if landmarks else distances
+        i = max(candidates, key=lambda v: scores[v])
+        landmarks.append(i)
+        distances, _ = frozen._dijkstra(i)
+        known[(i, False)] = distances
+        for v in range(n):
+            if distances[v] < nearest[v]:
+                nearest[v] = distances[v]
+    return landmarks, known
+
+
+def _avoid(frozen, k, rng, pool=None):
+    """ picks k landmarks using the 'avoid' strategy:
+
+    1. grow a shortest path tree from a random root r.
+    2. weigh each node v by how much the current landmarks underestimate
+       d(r, v), and sum the weights of each subtree. Subtrees that contain
+       a landmark are given weight zero.
+    3. from the heaviest node, walk down the tree along the heaviest
+       children. The leaf reached is the new landmark.
+
+    The searches to and from each new landmark run on the pool, if any,
+    together with the tree of the next round.
+
+    :return: list of landmarks, dict {(landmark, reverse): distances}
+    """
+    n = len(frozen._node_ids)
+    landmarks, forward, backward = [], [], []
+    if k == 0:
+        return landmarks, {}
+    r = rng.randrange(n)
+    distances, parents = frozen._dijkstra(r)
+    while True:
+        children = [[] for _ in range(n)]
+        order = []  # nodes in the tree ordered by distance from root.
+        for v in sorted(range(n), key=lambda v: distances[v]):
+            if distances[v] == float('inf'):
+                break
+            order.append(v)
+            if parents[v] != -1:
+                children[parents[v]].append(v)
+
+        size = [0.0] * n
+        has_landmark = [False] * n
+        for v in reversed(order):  # leaves first.
+            estimate = 0
+            for fw, bw in zip(forward, backward):
+                a, b = fw[v] - fw[r], bw[r] - bw[v]
+                if a > estimate:
+                    estimate = a
+                if b > estimate:
+                    estimate = b
+            size[v] += distances[v] - estimate
+            has_landmark[v] = has_landmark[v] or v in landmarks
+            p = parents[v]
+            if p != -1:
+                size[p] += size[v]
+                has_landmark[p] = has_landmark[p] or has_landmark[v]
+        for v in order:
+            if has_landmark[v]:
+                size[v] = 0
+
+        candidates = [v for v in order if v not in landmarks]
+        if not candidates:
+            candidates = [v for v in range(n) if v not in landmarks]
+            landmarks.append(rng.choice(candidates))
+        else:
+            v = max(candidates, key=lambda v: size[v])
+            while children[v]:
+                v = max(children[v], key=lambda c: size[c])
+            if v in landmarks:  # the subtree is covered already.
+                v = rng.choice(candidates)
+            landmarks.append(v)
+        tasks = [(landmarks[-1], False), (landmarks[-1], True)]
+        if len(landmarks) < k:
+            r = rng.randrange(n)
+            tasks.append((r, False))
+        results = _searches(frozen, tasks, pool)
+        forward.append(results[0][0])
+        backward.append(results[1][0])
+        if len(landmarks) == k:
+            break
+        distances, parents = results[2]
+    known = {}
+    for i, fw, bw in zip(landmarks, forward, backward):
+        known[(i, False)], known[(i, True)] = fw, bw
+    return landmarks, known
@@ -12,9 +12,12 @@ folder = Path(__file__).parent
 # Step 1. find the sha256 of the files used for this build.
 packages = [
     folder / 'graph' / "__init__.py",
+    folder / 'graph' / "all_pairs.py",
     folder / 'graph' / "assignment_problem.py",
+    folder / 'graph' / "contraction_hierarchy.py",
     folder / 'graph' / "finite_state_machine.py",
     folder / 'graph' / "hash.py",
+    folder / 'graph' / "landmarks.py",
     folder / 'graph' / "random.py",
     # folder / 'graph' / "routing.py",
     # folder / 'graph' / "scheduling_problem.py",
@@ -0,0 +1,239 @@
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from graph import Graph
+from graph.all_pairs import numpy_enabled, DistanceMatrix, johnson
+from tests.test_graph import graph02, graph03, graph05, london_underground
+
+
+def negative_edges_graph():
+    """ the example from the docstring of all_pairs_shortest_paths. """
+    return Graph(from_dict={
+        1: {2: 3, 3: 8, 5: -4},
+        2: {4: 1, 5: 7},
+        3: {2: 4},
+        4: {1: 2, 3: -5},
+        5: {4: 6}
+    })
+
+
+def random_graph(nodes, edges, seed=1):
+    random.seed(seed)
+    g = Graph()
+    for n in range(nodes):
+        g.add_node(n)
+    for _ in range(edges):
+        g.add_edge(random.randrange(nodes), random.randrange(nodes), random.randint(1, 100))
+    return g
+
+
+def test_numpy_floyd_warshall():
+    g = negative_edges_graph()
+    if not numpy_enabled:
+        try:
+            g.all_pairs_shortest_paths(method='numpy')
+            raise AssertionError
+        except ImportError:
+            return
+
+    for g in [negative_edges_graph(), graph02(), graph03(), graph05()]:
+        expected = g.all_pairs_shortest_paths()
+        dm = g.all_pairs_shortest_paths(method='numpy')
+        assert isinstance(dm, DistanceMatrix)
+        assert dm.to_dict() == expected
+        for n1 in g.nodes():
+            assert dm.row(n1) == expected[n1]
+            for n2 in g.nodes():
+                assert dm.distance(n1, n2) == expected[n1][n2]
+    assert dm.to_dict()[5][0] == float('inf')
+    assert isinstance(dm.distance(0, 5), int)
+    try:
+        dm.distance(0, 100)
+        raise AssertionError
+    except ValueError:
+        pass
+
+
+def test_numpy_floyd_warshall_options():
+    if not numpy_enabled:
+        return
+    g = random_graph(nodes=60, edges=400)
+    expected = g.all_pairs_shortest_paths()
+    for block_size in [1, 7, 16, 60, 100]:
+        dm = g.all_pairs_shortest_paths(method='numpy', block_size=block_size)
+        assert dm.to_dict() == expected, block_size
+    dm = g.all_pairs_shortest_paths(method='numpy', dtype='float32', block_size=16)
+    assert dm.matrix.dtype.name == 'float32'
+    assert dm.to_dict() == expected
+
+    for kwargs in [{'dtype': 'int8'}, {'block_size': 0}, {'method': 'dijkstra'}]:
+        kwargs.setdefault('method', 'numpy')
+        try:
+            g.all_pairs_shortest_paths(**kwargs)
+            raise AssertionError(kwargs)
+        except ValueError:
+            pass
+
+
+def test_numpy_floyd_warshall_benchmark():
+    if not numpy_enabled:
+        return
+    g = london_underground()
+    start = time.process_time()
+    expected = g.all_pairs_shortest_paths()
+    end = time.process_time()
+    dict_time = end - start
+
+    timings = []
+    for block_size in [None, 64]:
+        start = time.process_time()
+        dm = g.all_pairs_shortest_paths(method='numpy', block_size=block_size)
+        end = time.process_time()
+        timings.append(end - start)
+        assert dm.to_dict() == expected
+    print("all pairs shortest paths for {} nodes: dict {:.3f} seconds, numpy {:.3f} seconds, blocked {:.3f} seconds".format(
+        len(g.nodes()), dict_time, *timings))
+
+
+def test_johnson():
+    for g in [negative_edges_graph(), graph02(), graph03(), graph05(), random_graph(nodes=40, edges=150)]:
+        expected = g.all_pairs_shortest_paths()
+        assert g.all_pairs_shortest_paths(method='johnson', workers=1) == expected
+    assert g.all_pairs_shortest_paths(method='johnson', workers=2) == expected
+
+    g = negative_edges_graph()
+    g.add_node(6)  # isolated.
+    rows = johnson(g, workers=2)
+    assert next(rows) == (1, {1: 0, 2: 1, 3: -3, 4: 2, 5: -4, 6: float('inf')})
+    assert dict(rows) == {n: r for n, r in g.all_pairs_shortest_paths().items() if n != 1}
+
+    g = Graph(from_list=[(1, 2, 1.5), (2, 3, -0.5), (3, 1, 0.25)])
+    assert g.all_pairs_shortest_paths(method='johnson', workers=1) == g.all_pairs_shortest_paths()
+
+
+def test_johnson_stops_early():
+    g = random_graph(nodes=40, edges=150)
+    expected = g.all_pairs_shortest_paths()
+    rows = johnson(g, workers=2)
+    for _ in range(3):
+        n, row = next(rows)
+        assert row == expected[n]
+    rows.close()  # cancels the rows in flight.
+
+
+def test_johnson_errors():
+    g = Graph(from_list=[(1, 2, 1), (2, 3, -2), (3, 1, 0)])  # negative cycle.
+    try:
+        g.all_pairs_shortest_paths(method='johnson')
+        raise AssertionError
+    except ValueError:
+        pass
+    try:
+        johnson(graph02(), workers=0)
+        raise AssertionError
+    except ValueError:
+        pass
+
+
+def test_johnson_benchmark():
+    g = london_underground()
+    start = time.process_time()
+    expected = g.all_pairs_shortest_paths()
+    end = time.process_time()
+    dict_time = end - start
+
+    start = time.process_time()
+    rows = {}
+    for n, row in johnson(g, workers=1):
+        rows[n] = row
+    end = time.process_time()
+    print("all pairs shortest paths for {} nodes: Floyd-Warshall {:.3f} seconds, Johnson {:.3f} seconds".format(
+        len(g.nodes()), dict_time, end - start))
+    assert rows == expected
+
+
+def test_predecessor_matrix():
+    for g in [negative_edges_graph(), graph02(), graph05(), random_graph(nodes=30, edges=100)]:
+        g.add_node('isolated')
+        expected = g.all_pairs_shortest_paths()
+        engines = [dict(), dict(method='johnson', workers=1), dict(method='johnson', workers=2)]
+        if numpy_enabled:
+            engines += [dict(method='numpy'), dict(method='numpy', block_size=4)]
+        for kwargs in engines:
+            distances, paths = g.all_pairs_shortest_paths(paths=True, **kwargs)
+            if isinstance(distances, DistanceMatrix):
+                distances = distances.to_dict()
+            assert distances == expected, kwargs
+            for n1, row in expected.items():
+                for n2, d in row.items():
+                    path = paths.path(n1, n2)
+                    if d == float('inf'):
+                        assert path == [] and paths.predecessor(n1, n2) is None
+                    else:
+                        assert path[0] == n1 and path[-1] == n2
+                        assert sum(g.edge(a, b) for a, b in zip(path[:-1], path[1:])) == d
+                        if n1 != n2:
+                            assert paths.predecessor(n1, n2) == path[-2]
+
+    distances, paths = negative_edges_graph().all_pairs_shortest_paths(paths=True)
+    assert paths.path(1, 3) == [1, 5, 4, 3]
+    assert paths.path(3, 3) == [3]
+    try:
+        paths.path(1, 'missing')
+        raise AssertionError
+    except ValueError:
+        pass
+
+
+def test_memory_mapped_distance_matrix():
+    if not numpy_enabled:
+        return
+    g = negative_edges_graph()
+    g.add_node(6)  # isolated.
+    expected = g.all_pairs_shortest_paths()
+    with tempfile.TemporaryDirectory() as folder:
+        for method in ['numpy', 'johnson']:
+            filename = Path(folder) / f'{method}.apsp'
+            dm = g.all_pairs_shortest_paths(method=method, filename=filename, workers=1)
+            assert isinstance(dm, DistanceMatrix)
+            assert dm.to_dict() == expected
+            del dm
+
+            dm = DistanceMatrix.load(filename)
+            assert dm.to_dict() == expected
+            assert dm.distance(1, 3) == -3 and isinstance(dm.distance(1, 3), int)
+            assert dm.column(3) == {n: row[3] for n, row in expected.items()}
+            try:
+                dm.matrix[0, 0] = 1
+                raise AssertionError("the file was opened read only.")
+            except ValueError:
+                pass
+
+        dm = DistanceMatrix.load(filename, mode='r+')
+        dm.matrix[0, 1] = 0
+        dm.flush()
+        assert DistanceMatrix.load(filename).distance(1, 2) == 0
+
+        g = random_graph(nodes=30, edges=60)
+        dm = g.all_pairs_shortest_paths(method='numpy')
+        dm.save(Path(folder) / 'random.apsp')
+        dm2 = DistanceMatrix.load(Path(folder) / 'random.apsp')
+        assert dm2.to_dict() == dm.to_dict()
+        for chunk_size in [None, 1, 7]:
+            assert dm2.minsum(chunk_size) == g.minsum()
+            assert dm2.minmax(chunk_size) == g.minmax()
+
+        with open(Path(folder) / 'other', 'wb') as fo:
+            fo.write(b'not a distance matrix')
+        try:
+            DistanceMatrix.load(Path(folder) / 'other')
+            raise AssertionError
+        except ValueError:
+            pass
+    try:
+        g.all_pairs_shortest_paths(filename='apsp.bin')
+        raise AssertionError("the dict method has no file.")
+    except ValueError:
+        pass
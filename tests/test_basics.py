@@ -1,5 +1,9 @@
+import random
+import time
+
 from graph import Graph
 from tests.test_graph import graph02, graph01, graph05, graph_cycle_6, graph_cycle_5
+from tests.test_search import CountingEdges
 
 
 def test_to_from_dict():
@@ -142,6 +146,53 @@ def test_nodes_from_node():
         assert True
 
 
+def test_degree():
+    g = graph02()
+    assert g.in_degree(1) == 0
+    assert g.out_degree(1) == 2
+    assert g.in_degree(9) == 2
+    assert g.out_degree(9) == 0
+    assert g.in_degree(600) == g.out_degree(600) == 0  # 600 doesn't exist.
+
+
+def test_reverse_index_after_deletion():
+    g = graph02()
+    g.add_edge(9, 9)
+    g.del_edge(6, 9)
+    assert set(g.nodes(to_node=9)) == {8, 9}
+    assert set(g.edges(to_node=9)) == {(8, 9, 1), (9, 9, 1)}
+    g.del_node(5)
+    assert g.nodes(to_node=6) == [3]
+    assert g.nodes(to_node=8) == [7]
+    assert g.nodes(from_node=2) == [3]
+    g.del_node(9)
+    assert g.nodes(to_node=9) == []
+    assert g.nodes(out_degree=0) == [6, 8]
+
+
+def test_incoming_edge_queries_on_large_graph():
+    random.seed(1)
+    nodes, edges = 10 ** 4, 10 ** 5
+    start = time.process_time()
+    g = Graph()
+    for _ in range(edges):
+        g.add_edge(random.randrange(nodes), random.randrange(nodes))
+    end = time.process_time()
+    print("Building graph with {} edges took {:.3f} seconds".format(edges, end - start))
+
+    g._edges, g._reverse_edges = CountingEdges(g._edges), CountingEdges(g._reverse_edges)
+    start = time.process_time()
+    incoming = sum(len(g.nodes(to_node=n)) for n in g.nodes())
+    sources = g.nodes(in_degree=0)
+    end = time.process_time()
+    print("Querying incoming edges of {} nodes took {:.3f} seconds".format(nodes, end - start))
+    # one lookup in the reverse index per node and query, instead of a scan of all edges.
+    assert g._edges.lookups == 0
+    assert g._reverse_edges.lookups <= 2 * len(g.nodes())
+    assert incoming == len(g.edges())
+    assert all(g.edges(to_node=n) == [] for n in sources)
+
+
 def test01():
     """
     Asserts that the shortest_path is correct
@@ -0,0 +1,108 @@
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from graph import Graph
+from graph.contraction_hierarchy import ContractionHierarchy
+from tests.test_graph import graph01, graph02, graph03, graph05, london_underground
+from tests.test_search import grid_graph
+
+
+def test_query_small_graphs():
+    for g in [graph01(), graph02(), graph03(), graph05()]:
+        ch = g.build_contraction_hierarchy()
+        for n1 in g.nodes():
+            for n2 in g.nodes():
+                d1, p1 = g.shortest_path(n1, n2)
+                d2, p2 = ch.query(n1, n2)
+                assert d1 == d2, (n1, n2, d1, d2)
+                if p1:
+                    assert p2[0] == n1 and p2[-1] == n2
+                    assert n1 == n2 or g.distance_from_path(p2) == d2
+                else:
+                    assert p2 == []
+    assert ch.query(1, 100) == (float('inf'), [])
+
+
+def test_query_london_underground():
+    g = london_underground()
+    start = time.process_time()
+    ch = g.build_contraction_hierarchy()
+    end = time.process_time()
+    print("building the contraction hierarchy took {:.3f} seconds".format(end - start))
+
+    random.seed(6)
+    nodes = g.nodes()
+    pairs = [(random.choice(nodes), random.choice(nodes)) for _ in range(200)]
+    dijkstra_time, ch_time = 0, 0
+    for n1, n2 in pairs:
+        t = time.process_time()
+        d1, p1 = g.shortest_path(n1, n2)
+        dijkstra_time += time.process_time() - t
+
+        t = time.process_time()
+        d2, p2 = ch.query(n1, n2)
+        ch_time += time.process_time() - t
+        assert d1 == d2, (n1, n2, d1, d2)
+        assert g.has_path(p2)
+    print("{} queries: Dijkstra {:.4f} seconds, contraction hierarchy {:.4f} seconds".format(
+        len(pairs), dijkstra_time, ch_time))
+
+
+def test_query_grid():
+    g = grid_graph(40, 40)
+    ch = g.build_contraction_hierarchy()
+    random.seed(7)
+    nodes = g.nodes()
+    for _ in range(100):
+        n1, n2 = random.choice(nodes), random.choice(nodes)
+        d, p = ch.query(n1, n2)
+        assert d == abs(n1[0] - n2[0]) + abs(n1[1] - n2[1])
+        assert len(p) == d + 1 and g.has_path(p)
+
+
+def test_mutation_is_detected():
+    g = graph03()
+    ch = g.build_contraction_hierarchy()
+    assert not ch.stale
+    g.add_edge(1, 8, 1)
+    assert ch.stale
+    try:
+        ch.query(1, 8)
+        raise AssertionError("a stale hierarchy must not answer.")
+    except ValueError:
+        pass
+    ch.rebuild()
+    assert ch.query(1, 8) == (1, [1, 8])
+
+    ch = g.build_contraction_hierarchy(auto_rebuild=True)
+    g.del_edge(1, 8)
+    assert ch.query(1, 8) == g.shortest_path(1, 8)
+
+
+def test_negative_edges():
+    g = Graph(from_list=[(1, 2, -1)])
+    try:
+        g.build_contraction_hierarchy()
+        raise AssertionError
+    except ValueError:
+        pass
+
+
+def test_save_and_load():
+    g = london_underground()
+    ch = g.build_contraction_hierarchy()
+    with tempfile.TemporaryDirectory() as folder:
+        filename = Path(folder) / 'london.ch'
+        ch.save(filename)
+        ch2 = ContractionHierarchy.load(filename, graph=g)
+        for n1, n2 in [(1, 300), (11, 163), (49, 87)]:
+            assert ch2.query(n1, n2) == ch.query(n1, n2)
+
+        g.add_edge(1, 300, 1)
+        try:
+            ContractionHierarchy.load(filename, graph=g)
+            raise AssertionError("the graph has changed.")
+        except ValueError:
+            pass
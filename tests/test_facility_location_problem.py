@@ -1,3 +1,5 @@
+from graph.all_pairs import johnson
+from tests.test_all_pairs import negative_edges_graph, random_graph
 from tests.test_graph import london_underground
 """
 The problem of deciding the exact place in a community where a school or a fire station should be located,
@@ -29,3 +31,46 @@ def test_minmax():
     assert station_list == [(51.5226, -0.1571, 'Baker Street'),
                             (51.5142, -0.1494, 'Bond Street'),
                             (51.5234, -0.1466, "Regent's Park")]
+
+
+def expected_facilities(g, reduction):
+    values = {n: reduction(row.values()) for n, row in g.all_pairs_shortest_paths().items()}
+    smallest = min(values.values())
+    return [n for n, v in values.items() if v == smallest], values, smallest
+
+
+def test_minsum_minmax_bounded_search():
+    graphs = [random_graph(nodes=40, edges=120, seed=seed) for seed in range(3)]
+    graphs.append(negative_edges_graph())
+    g = negative_edges_graph()
+    g.add_node(6)  # unreachable, so all values are inf.
+    graphs.append(g)
+    for g in graphs:
+        assert g.minsum() == expected_facilities(g, sum)[0]
+        assert g.minmax() == expected_facilities(g, max)[0]
+    g = london_underground()
+    assert g.minsum(workers=2) == g.minsum()
+    assert g.minmax(workers=2) == g.minmax()
+
+
+def test_minsum_minmax_sampled():
+    g = london_underground()
+    rows = dict(johnson(g, workers=1))
+    for method, reduction in [(g.minsum, sum), (g.minmax, max)]:
+        values = {n: reduction(row.values()) for n, row in rows.items()}
+        smallest = min(values.values())
+        for sample in [1, 10, 50]:
+            stations, error = method(sample=sample, seed=sample)
+            assert stations and error >= 0
+            for station in stations:
+                assert values[station] - smallest <= error * (1 + 1e-9)
+
+    g = random_graph(nodes=40, edges=300, seed=0)  # strongly connected, so all values are finite.
+    for method in [g.minsum, g.minmax]:
+        stations, error = method(sample=len(g.nodes()))
+        assert stations == method() and error == 0
+    try:
+        g.minsum(sample=0)
+        raise AssertionError
+    except ValueError:
+        pass
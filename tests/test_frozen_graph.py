@@ -0,0 +1,188 @@
+import random
+import sys
+import time
+
+from graph import Graph, Graph3D, FrozenGraph, network_size, components, degree_of_separation
+from tests.test_graph import graph02, graph03, graph05, fully_connected_4, london_underground
+from tests.test_search import social_network
+
+
+def test_freeze_read_api():
+    g = graph03()
+    g.add_node(9, obj="isolated")
+    f = g.freeze()
+    assert isinstance(f, FrozenGraph)
+    assert f.nodes() == g.nodes()
+    assert f.edges() == g.edges()
+    assert f.to_dict() == g.to_dict()
+    assert f.node(9) == "isolated"
+    assert 9 in f and 10 not in f
+    for n in g.nodes():
+        assert f.nodes(from_node=n) == g.nodes(from_node=n)
+        assert set(f.nodes(to_node=n)) == set(g.nodes(to_node=n))
+        assert f.edges(from_node=n) == g.edges(from_node=n)
+        assert set(f.edges(to_node=n)) == set(g.edges(to_node=n))
+        assert f.in_degree(n) == g.in_degree(n)
+        assert f.out_degree(n) == g.out_degree(n)
+    for degree in range(6):
+        assert f.nodes(in_degree=degree) == g.nodes(in_degree=degree)
+        assert f.nodes(out_degree=degree) == g.nodes(out_degree=degree)
+    assert f.edge(1, 2) == 1 and isinstance(f.edge(1, 2), int)
+    assert f.edge(1, 8, default=-1) == -1
+    assert f.edges(path=[1, 2, 4]) == g.edges(path=[1, 2, 4])
+
+
+def test_freeze_search():
+    g = graph03()
+    f = g.freeze()
+    for n1 in g.nodes():
+        for n2 in g.nodes():
+            assert f.shortest_path(n1, n2) == g.shortest_path(n1, n2), (n1, n2)
+            assert f.breadth_first_search(n1, n2)[0] == g.breadth_first_search(n1, n2)[0], (n1, n2)
+    assert f.shortest_path(8, 1) == (float('inf'), [])
+    assert not f.is_connected(8, 1)
+    assert f.is_connected(1, 8)
+
+    g = london_underground()
+    f = g.freeze()
+    assert f.shortest_path(1, 300) == g.shortest_path(1, 300)
+
+
+def test_frozen_bucket_queue():
+    g = graph03()
+    f = g.freeze()
+    assert f._bucket_queue
+    for n1 in g.nodes():
+        for n2 in g.nodes():
+            assert f.shortest_path(n1, n2) == g.shortest_path(n1, n2), (n1, n2)
+    assert isinstance(f.shortest_path(1, 8)[0], int)
+
+    assert not Graph(from_list=[(1, 2, 0.5)]).freeze()._bucket_queue
+    assert not Graph(from_list=[(1, 2, -1)]).freeze()._bucket_queue
+    assert not Graph(from_list=[(1, 2, True)]).freeze()._bucket_queue
+
+    f = Graph(from_list=[(1, 2, FrozenGraph.bucket_queue_max_weight + 1), (2, 3, 1)]).freeze()
+    assert not f._bucket_queue
+    assert f.shortest_path(1, 3, weights='int') == f.shortest_path(1, 3)
+    for g, weights in [(graph03(), 'float'), (Graph(from_list=[(1, 2, 0.5)]), 'int'),
+                       (Graph(from_list=[(1, 2, -1)]), 'int')]:
+        try:
+            g.freeze().shortest_path(1, 2, weights=weights)
+            raise AssertionError
+        except ValueError:
+            pass
+    assert not Graph(from_list=[(1, 2, FrozenGraph.bucket_queue_max_weight + 1)]).freeze()._bucket_queue
+
+
+def test_freeze_components():
+    g = Graph(from_list=[
+        (1, 2, 1),  # component 1
+        (2, 1, 1),
+        (3, 3, 1),  # component 2
+        (4, 5, 1),
+        (5, 6, 1),  # component 3
+        (5, 7, 1),
+        (6, 8, 1),
+        (7, 8, 1),
+        (8, 9, 1),
+    ])
+    g.add_node(10)  # component 4
+    components = g.freeze().components()
+    assert len(components) == 4
+    assert {1, 2} in components
+    assert {3} in components
+    assert {4, 5, 6, 7, 8, 9} in components
+    assert {10} in components
+
+
+def test_frozen_network_size():
+    for g in [graph02(), graph03(), fully_connected_4()]:
+        f = g.freeze()
+        for n in g.nodes():
+            for degrees in [None, 0, 1, 2, 3]:
+                assert f.network_size(n, degrees) == g.network_size(n, degrees), (n, degrees)
+                assert network_size(f, n, degrees) == g.network_size(n, degrees)
+
+
+def test_frozen_degree_of_separation():
+    for g in [graph02(), graph03(), graph05()]:
+        f = g.freeze()
+        for n1 in g.nodes():
+            for n2 in g.nodes():
+                assert f.degree_of_separation(n1, n2) == g.degree_of_separation(n1, n2), (n1, n2)
+                assert degree_of_separation(f, n1, n2) == g.degree_of_separation(n1, n2)
+    assert f.degree_of_separation(0, 100) == float('inf')
+
+
+def test_direction_optimizing_bfs():
+    g = social_network(people=20000, friends=20)
+    f = g.freeze()
+    assert components(f) == [set(g.nodes())]
+
+    start = time.process_time()
+    top_down, depth1 = f._bfs(0, direction_optimizing=False)
+    end = time.process_time()
+    top_down_time = end - start
+
+    start = time.process_time()
+    visited, depth2 = f._bfs(0)
+    end = time.process_time()
+    print("BFS over {} edges: top-down {:.3f} seconds, direction optimizing {:.3f} seconds".format(
+        len(f._targets), top_down_time, end - start))
+    assert visited == top_down and depth1 == depth2
+
+    # the dict based search of Graph switches to bottom-up as well.
+    assert g.network_size(0) == network_size(f, 0) == set(g.nodes())
+    for n in random.sample(g.nodes(), 10):
+        for degrees in [1, 2, 3, 4]:
+            assert f.network_size(n, degrees) == g.network_size(n, degrees)
+        assert f.degree_of_separation(0, n) == g.degree_of_separation(0, n)
+
+
+def test_frozen_is_immutable():
+    f = graph02().freeze()
+    for method, args in [(f.add_edge, (1, 9, 1)), (f.del_edge, (1, 2)), (f.add_node, (10,)), (f.del_node, (1,))]:
+        try:
+            method(*args)
+            raise AssertionError(f"{method} should be blocked.")
+        except ValueError:
+            pass
+    assert f.edge(1, 9) is None
+
+
+def test_thaw():
+    g = graph03()
+    g.add_node(9, obj="isolated")
+    g2 = g.freeze().thaw()
+    assert type(g2) is Graph
+    assert g2.to_dict() == g.to_dict()
+    assert g2.node(9) == "isolated"
+    g2.add_edge(8, 9, 1)
+    assert g.edge(8, 9) is None
+
+    g3 = Graph3D(from_list=[((0, 0, 0), (1, 1, 1), 1.5)])
+    g4 = g3.freeze().thaw()
+    assert type(g4) is Graph3D
+    assert g4.edges() == g3.edges()
+
+
+def test_frozen_memory_footprint():
+    random.seed(2)
+    nodes, edges = 10 ** 3, 10 ** 4
+    g = Graph()
+    for _ in range(edges):
+        g.add_edge(random.randrange(nodes), random.randrange(nodes), random.random())
+
+    start = time.process_time()
+    f = g.freeze()
+    end = time.process_time()
+    print("Freezing graph with {} edges took {:.3f} seconds".format(edges, end - start))
+
+    dict_size = sum(sys.getsizeof(edges) + sum(sys.getsizeof(d) for d in edges.values())
+                    for edges in (g._edges, g._reverse_edges))
+    csr_size = sum(sys.getsizeof(a) for a in (
+        f._offsets, f._targets, f._weights,  # forward CSR
+        f._r_offsets, f._r_sources, f._r_weights,  # reverse CSR
+        f._index, f._node_ids, f._objects))
+    print("edges as dicts of dicts: {} bytes, as CSR: {} bytes".format(dict_size, csr_size))
+    assert csr_size < dict_size / 2
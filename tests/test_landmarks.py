@@ -0,0 +1,96 @@
+import random
+
+from graph import Graph
+from graph.landmarks import LandmarkIndex
+from tests.test_graph import graph01, graph03, graph05, london_underground
+from tests.test_search import grid_graph
+
+
+def test_landmark_strategies():
+    for g in [graph01(), graph03(), graph05()]:
+        for strategy in ['random', 'farthest', 'avoid']:
+            index = g.build_landmark_index(k=3, strategy=strategy, workers=1, seed=1)
+            assert len(index.landmarks) == 3
+            for n1 in g.nodes():
+                for n2 in g.nodes():
+                    d1, p1 = g.shortest_path(n1, n2)
+                    d2, p2 = g.shortest_path(n1, n2, landmarks=index)
+                    assert d1 == d2, (strategy, n1, n2, d1, d2)
+                    assert index.lower_bound(n1, n2) <= d1
+
+
+def test_landmarks_london_underground():
+    g = london_underground()
+    index = g.build_landmark_index(k=4, strategy='avoid', workers=2, seed=2)
+    random.seed(8)
+    nodes = g.nodes()
+    for _ in range(100):
+        n1, n2 = random.choice(nodes), random.choice(nodes)
+        d1, p1 = g.shortest_path(n1, n2)
+        d2, p2 = g.shortest_path(n1, n2, landmarks=index)
+        assert d1 == d2, (n1, n2, d1, d2)
+        assert g.has_path(p2)
+
+
+def test_landmarks_in_parallel():
+    g = london_underground()
+    for strategy in ['random', 'farthest', 'avoid']:
+        serial = LandmarkIndex(g, k=4, strategy=strategy, workers=1, seed=4)
+        parallel = LandmarkIndex(g, k=4, strategy=strategy, workers=2, seed=4)
+        assert parallel.landmarks == serial.landmarks, strategy
+        assert parallel._forward == serial._forward
+        assert parallel._backward == serial._backward
+    assert LandmarkIndex(Graph(), k=2, workers=2).landmarks == []
+
+
+def test_landmarks_reduce_search_space():
+    g = grid_graph(60, 60)
+    index = LandmarkIndex(g, k=4, strategy='farthest', workers=2, seed=3)
+    reached = {'zero': set(), 'landmarks': set()}
+
+    def counting(heuristic, key):
+        def h(n):
+            reached[key].add(n)
+            return heuristic(n)
+        return h
+
+    start, end = (5, 5), (50, 40)
+    d1, _ = g.a_star_search(start, end, counting(lambda n: 0, 'zero'))
+    d2, _ = g.a_star_search(start, end, counting(index.heuristic(end), 'landmarks'))
+    assert d1 == d2 == 80
+    print("nodes reached: Dijkstra {}, ALT {}".format(len(reached['zero']), len(reached['landmarks'])))
+    assert len(reached['landmarks']) < len(reached['zero']) / 2
+
+
+def test_landmarks_on_disconnected_graph():
+    g = Graph(from_list=[(1, 2, 1), (2, 3, 1), (4, 5, 1)])
+    index = g.build_landmark_index(k=2, strategy='farthest', workers=1)
+    assert g.shortest_path(1, 5, landmarks=index) == (float('inf'), [])
+    assert g.shortest_path(1, 3, landmarks=index) == (2, [1, 2, 3])
+    assert g.shortest_path(1, 99, landmarks=index) == (float('inf'), [])
+
+
+def test_stale_landmarks():
+    g = graph03()
+    index = g.build_landmark_index(k=2, workers=1)
+    g.add_edge(1, 8, 1)
+    try:
+        g.shortest_path(1, 8, landmarks=index)
+        raise AssertionError("a stale index must not answer.")
+    except ValueError:
+        pass
+
+
+def test_bad_landmark_config():
+    g = graph03()
+    for kwargs in [{'k': 0}, {'strategy': 'nearest'}, {'workers': 0}]:
+        try:
+            g.build_landmark_index(**kwargs)
+            raise AssertionError(kwargs)
+        except ValueError:
+            pass
+    try:
+        Graph(from_list=[(1, 2, -1)]).build_landmark_index()
+        raise AssertionError
+    except ValueError:
+        pass
@@ -3,7 +3,7 @@ import time
 from itertools import combinations, permutations
 
 from graph import Graph
-from tests.test_graph import graph01, graph02, graph03, graph04, graph05, graph_cycle_5
+from tests.test_graph import graph01, graph02, graph03, graph04, graph05, graph_cycle_5, london_underground
 
 
 def test_shortest_path01():
@@ -156,6 +156,181 @@ def test_shortest_path_fail():
     assert p == []
 
 
+def grid_graph(width, height):
+    """ bidirectional lattice with `width` x `height` nodes and unit weights. """
+    g = Graph()
+    for x in range(width):
+        for y in range(height):
+            if x + 1 < width:
+                g.add_edge((x, y), (x + 1, y), 1, bidirectional=True)
+            if y + 1 < height:
+                g.add_edge((x, y), (x, y + 1), 1, bidirectional=True)
+    return g
+
+
+class CountingEdges(dict):
+    """ edges {n1: {n2: distance}} that count the neighbour lookups of the
+    searches, i.e. the nodes they expand. """
+
+    def __init__(self, edges):
+        super().__init__(edges)
+        self.lookups = 0
+
+    def get(self, key, default=None):
+        self.lookups += 1
+        return super().get(key, default)
+
+
+def count_lookups(g):
+    """ replaces the adjacency of graph `g` by CountingEdges.
+    :return: function that returns the lookups since the previous call.
+    """
+    g._edges, g._reverse_edges = CountingEdges(g._edges), CountingEdges(g._reverse_edges)
+
+    def lookups():
+        n = g._edges.lookups + g._reverse_edges.lookups
+        g._edges.lookups = g._reverse_edges.lookups = 0
+        return n
+    return lookups
+
+
+def test_shortest_path_bidirectional():
+    for g in [graph01(), graph02(), graph03(), graph04(), graph05()]:
+        for n1 in g.nodes():
+            for n2 in g.nodes():
+                d1, p1 = g.shortest_path(n1, n2)
+                d2, p2 = g.shortest_path_bidirectional(n1, n2)
+                assert d1 == d2, (n1, n2, d1, d2)
+                if p2:
+                    assert g.distance_from_path(p2) == d2 or n1 == n2
+                    assert p2[0] == n1 and p2[-1] == n2
+                else:
+                    assert p1 == []
+
+    g = london_underground()
+    random.seed(3)
+    nodes = g.nodes()
+    for _ in range(100):
+        n1, n2 = random.choice(nodes), random.choice(nodes)
+        d1, p1 = g.shortest_path(n1, n2)
+        d2, p2 = g.shortest_path_bidirectional(n1, n2)
+        assert d1 == d2, (n1, n2, d1, d2)
+        assert g.has_path(p2)
+
+
+def test_shortest_path_local_queries_on_large_graph():
+    g = grid_graph(300, 300)  # 90,000 nodes, 358,800 edges.
+    random.seed(4)
+    queries = []
+    for _ in range(100):
+        x, y = random.randrange(290), random.randrange(290)
+        queries.append(((x, y), (x + random.randrange(10), y + random.randrange(10))))
+    lookups = count_lookups(g)
+
+    start = time.process_time()
+    for a, b in queries:
+        d, p = g.shortest_path(a, b)
+        assert d == abs(a[0] - b[0]) + abs(a[1] - b[1])
+    end = time.process_time()
+    print("{} local shortest_path queries took {:.3f} seconds".format(len(queries), end - start))
+    # a search to a node at distance d <= 18 expands at most 2d^2 + 2d + 1 < 700
+    # nodes, not the 90,000 nodes of the grid.
+    assert lookups() < 700 * len(queries)
+
+    start = time.process_time()
+    for a, b in queries:
+        d, p = g.shortest_path_bidirectional(a, b)
+        assert d == abs(a[0] - b[0]) + abs(a[1] - b[1])
+    end = time.process_time()
+    print("{} local shortest_path_bidirectional queries took {:.3f} seconds".format(len(queries), end - start))
+    assert lookups() < 700 * len(queries)
+
+
+def test_shortest_path_tree():
+    g = graph03()
+    tree = g.shortest_path_tree(1)
+    for n in g.nodes():
+        d, p = g.shortest_path(1, n)
+        assert tree.distance(n) == d
+        assert tree.path(n) == p
+    assert tree.path(100) == [] and tree.distance(100) == float('inf')
+    assert 100 not in tree and 8 in tree
+
+    tree = g.shortest_path_tree(1, cutoff=7)
+    assert set(tree.distances) == {1, 2, 3, 4}, tree.distances
+    assert tree.path(6) == []
+    assert tree.path(3) == [1, 2, 4, 3]
+
+    tree = g.shortest_path_tree(1, targets=[4])
+    assert tree.path(4) == [1, 2, 4]
+    assert 8 not in tree
+
+    tree = g.shortest_path_tree(8)
+    assert tree.distances == {8: 0, 7: 5}
+
+
+def test_shortest_path_tree_many_destinations():
+    g = grid_graph(150, 150)
+    random.seed(9)
+    nodes = g.nodes()
+    destinations = random.sample(nodes, 5000)
+    lookups = count_lookups(g)
+
+    start = time.process_time()
+    tree = g.shortest_path_tree((0, 0), targets=destinations)
+    paths = [tree.path(n) for n in destinations]
+    end = time.process_time()
+    print("paths to {} destinations took {:.3f} seconds".format(len(destinations), end - start))
+    for n, p in zip(destinations, paths):
+        assert len(p) == n[0] + n[1] + 1
+        assert tree.distance(n) == n[0] + n[1]
+    assert lookups() <= len(nodes)  # one search, each node is expanded at most once.
+
+
+def test_shortest_paths_many():
+    g = graph03()
+    pairs = [(n1, n2) for n1 in g.nodes() for n2 in g.nodes()] + [(1, 100), (100, 1)]
+    expected = [g.shortest_path(n1, n2) for n1, n2 in pairs]
+    assert g.shortest_paths_many(pairs, workers=1) == expected
+    assert g.shortest_paths_many(pairs, workers=2) == expected
+    assert g.shortest_paths_many([]) == []
+    try:
+        g.shortest_paths_many(pairs, workers=0)
+        raise AssertionError
+    except ValueError:
+        pass
+
+
+def test_shortest_paths_many_stops_at_targets():
+    g = Graph(from_list=[(n, n + 1, 1) for n in range(1000)])
+    frozen = g.freeze()
+    distances, _ = frozen._dijkstra(0, targets={2, 5})
+    # the search stops when 5 is settled, before the edges of 5 are followed.
+    assert [d for d in distances if d != float('inf')] == [0, 1, 2, 3, 4, 5]
+    distances, _ = frozen._dijkstra(999, targets={10}, reverse=True)
+    assert sum(1 for d in distances if d != float('inf')) == 990
+    assert g.shortest_paths_many([(0, 5), (0, 2)], workers=1) == [(5, list(range(6))), (2, [0, 1, 2])]
+
+
+def test_shortest_paths_many_on_large_graph():
+    g = london_underground()
+    random.seed(10)
+    nodes = g.nodes()
+    pairs = [(random.choice(nodes[:20]), random.choice(nodes)) for _ in range(2000)]
+
+    start = time.process_time()
+    expected = [g.shortest_path(n1, n2)[0] for n1, n2 in pairs]
+    end = time.process_time()
+    print("{} shortest_path calls took {:.3f} seconds".format(len(pairs), end - start))
+
+    start = time.process_time()
+    results = g.shortest_paths_many(pairs, workers=1)
+    end = time.process_time()
+    print("shortest_paths_many for {} pairs took {:.3f} seconds".format(len(pairs), end - start))
+    assert [d for d, p in results] == expected
+    assert all(g.has_path(p) for d, p in results if len(p) > 1)
+
+
 def test_distance():
     g = graph02()
     p = [1, 2, 3, 6, 9]
@@ -175,6 +350,52 @@ def test_bfs():
     assert path == []
 
 
+def social_network(people, friends, seed=11):
+    """ random graph where each person befriends `friends` others (both ways).
+    The diameter of such graphs grows with log(people). """
+    random.seed(seed)
+    g = Graph()
+    for n1 in range(people):
+        for n2 in random.sample(range(people), friends):
+            if n1 != n2:
+                g.add_edge(n1, n2, 1, bidirectional=True)
+    return g
+
+
+def test_bfs_bidirectional():
+    for g in [graph01(), graph02(), graph03(), graph04(), graph05(), graph_cycle_5()]:
+        for n1 in g.nodes():
+            for n2 in g.nodes():
+                d1, p1 = g.breadth_first_search(n1, n2)
+                d2, p2 = g.breadth_first_search_bidirectional(n1, n2)
+                assert d1 == d2, (n1, n2, d1, d2)
+                assert len(p1) == len(p2)
+                if p2:
+                    assert g.has_path(p2) and p2[0] == n1 and p2[-1] == n2
+    assert g.breadth_first_search_bidirectional(1, 900) == (float('inf'), [])
+
+
+def test_bfs_on_social_network():
+    g = social_network(people=20000, friends=5)
+    random.seed(12)
+    pairs = [(random.randrange(20000), random.randrange(20000)) for _ in range(20)]
+    lookups = count_lookups(g)
+
+    start = time.process_time()
+    expected = [g.breadth_first_search(n1, n2)[0] for n1, n2 in pairs]
+    end = time.process_time()
+    bfs_time, bfs_lookups = end - start, lookups()
+
+    start = time.process_time()
+    degrees = [g.degree_of_separation(n1, n2) for n1, n2 in pairs]
+    end = time.process_time()
+    bidirectional_time, bidirectional_lookups = end - start, lookups()
+    print("{} queries: BFS {:.3f} seconds, bidirectional BFS {:.3f} seconds".format(
+        len(pairs), bfs_time, bidirectional_time))
+    assert degrees == expected
+    assert bidirectional_lookups * 10 < bfs_lookups, (bidirectional_lookups, bfs_lookups)
+
+
 def test_shortest_tree_all_pairs01():
     g = Graph()
     links = [
@@ -271,10 +492,7 @@ def test_all_paths05():
     links = [(1, 2), (2, 3), (3, 4), (4, 5), (4, 6), (6, 2), (6, 7), (7, 8), (8, 9), (9, 10), (10, 2)]
     g = Graph(from_list=[(a, b, 1) for a, b in links])
     paths = g.all_paths(start=1, end=5)
-    expected = [[1, 2, 3, 4, 5],
-                [1, 2, 3, 4, 6, 2, 3, 4, 5],
-                [1, 2, 3, 4, 6, 7, 8, 9, 10, 2, 3, 4, 5]]
-    assert all(i in expected for i in paths) and all(i in paths for i in expected)
+    assert paths == [[1, 2, 3, 4, 5]]  # loops are not repeated.
 
 
 def test_all_paths06():
@@ -286,6 +504,186 @@ def test_all_paths06():
     assert True, "All permutations of start and end passed."
 
 
+def test_all_paths_self_loops():
+    g = Graph(from_list=[(0, 0, 1), (0, 1, 1), (0, 6, 1), (2, 1, 1), (2, 7, 1),
+                         (7, 2, 1), (7, 3, 1), (7, 4, 1), (7, 7, 1)])
+    assert g.all_paths(0, 1) == [[0, 1]]
+    g = Graph(from_list=[(0, 2, 1), (2, 2, 1), (2, 1, 1)])
+    assert g.all_paths(0, 1) == [[0, 2, 1]]
+
+
+def test_iter_simple_paths():
+    g = graph02()
+    expected = sorted(g.all_paths(1, 9))
+    assert sorted(g.iter_simple_paths(1, 9)) == expected
+    assert sorted(g.iter_simple_paths(1, 9, workers=2)) == expected
+    assert list(g.iter_simple_paths(1, 4, max_length=1)) == [[1, 4]]
+    assert list(g.iter_simple_paths(9, 1)) == []
+    assert list(g.iter_simple_paths(1, 100)) == []
+
+    # loops are not repeated.
+    links = [(1, 2), (2, 3), (3, 4), (4, 5), (4, 6), (6, 2), (6, 7), (7, 8), (8, 9), (9, 10), (10, 2)]
+    g = Graph(from_list=[(a, b, 1) for a, b in links])
+    assert list(g.iter_simple_paths(1, 5)) == [[1, 2, 3, 4, 5]]
+    for start, end in permutations(range(1, 11), 2):
+        for path in g.iter_simple_paths(start, end):
+            assert path[0] == start and path[-1] == end
+            assert len(set(path)) == len(path) and g.has_path(path)
+
+
+def test_iter_simple_paths_limits():
+    g = grid_graph(4, 4)
+    paths = list(g.iter_simple_paths((0, 0), (3, 3)))
+    assert len(paths) == 184  # self-avoiding walks across a 4 x 4 lattice.
+    assert len({tuple(p) for p in paths}) == 184
+    parallel = list(g.iter_simple_paths((0, 0), (3, 3), workers=2))
+    assert sorted(parallel) == sorted(paths)
+
+    for max_length in [6, 8, 10]:
+        bounded = list(g.iter_simple_paths((0, 0), (3, 3), max_length=max_length))
+        assert sorted(bounded) == sorted(p for p in paths if len(p) - 1 <= max_length)
+        parallel = list(g.iter_simple_paths((0, 0), (3, 3), max_length=max_length, workers=2))
+        assert sorted(parallel) == sorted(bounded)
+
+    assert len(list(g.iter_simple_paths((0, 0), (3, 3), max_paths=10))) == 10
+    assert len(list(g.iter_simple_paths((0, 0), (3, 3), max_paths=10, workers=2))) == 10
+
+    for kwargs in [{'max_length': 0}, {'max_paths': 0}, {'workers': 0}]:
+        try:
+            g.iter_simple_paths((0, 0), (3, 3), **kwargs)
+            raise AssertionError(kwargs)
+        except ValueError:
+            pass
+    try:
+        g.iter_simple_paths((0, 0), (0, 0))
+        raise AssertionError
+    except ValueError:
+        pass
+
+
+def test_iter_simple_paths_stops_workers():
+    g = grid_graph(5, 5)
+    paths = g.iter_simple_paths((2, 2), (0, 0), workers=2)  # 4 first hops for 2 workers.
+    first = [next(paths) for _ in range(3)]
+    paths.close()  # cancels the pending searches and stops the pool.
+    assert all(p[0] == (2, 2) and p[-1] == (0, 0) and g.has_path(p) for p in first)
+    assert len(list(g.iter_simple_paths((2, 2), (0, 0), workers=2, max_paths=5))) == 5
+
+
+def test_iter_simple_paths_is_lazy():
+    g = grid_graph(30, 30)  # far too many paths to enumerate.
+    lookups = count_lookups(g)
+    start = time.process_time()
+    paths = []
+    for path in g.iter_simple_paths((0, 0), (29, 29)):
+        paths.append(path)
+        if len(paths) == 100:
+            break
+    end = time.process_time()
+    print("100 simple paths took {:.3f} seconds".format(end - start))
+    assert all(g.has_path(p) for p in paths)
+    assert lookups() < 30 * len(paths)  # a few expansions per path, not the paths of the whole grid.
+
+
+def test_shortest_path_int_weights():
+    for g in [graph01(), graph02(), graph03(), graph04(), graph05(), grid_graph(10, 10)]:
+        for n1 in g.nodes():
+            for n2 in g.nodes():
+                d1, p1 = g.shortest_path(n1, n2)
+                d2, p2 = g.shortest_path(n1, n2, weights='int')
+                assert d1 == d2, (n1, n2, d1, d2)
+                assert p2 == [] if p1 == [] else g.distance_from_path(p2) == d2
+
+    g = Graph(from_list=[(1, 2, 0), (2, 3, 0), (1, 3, 1), (3, 4, 2)])  # zero values are allowed.
+    assert g.shortest_path(1, 4, weights='int') == (2, [1, 2, 3, 4])
+    assert g.shortest_path(4, 1, weights='int') == (float('inf'), [])
+
+    for g in [Graph(from_list=[(1, 2, 0.5)]), Graph(from_list=[(1, 2, -1)]), Graph(from_list=[(1, 2, True)])]:
+        try:
+            g.shortest_path(1, 2, weights='int')
+            raise AssertionError
+        except ValueError:
+            pass
+    try:
+        g.shortest_path(1, 2, weights='float')
+        raise AssertionError
+    except ValueError:
+        pass
+
+
+def test_shortest_path_int_weights_benchmark():
+    random.seed(5)
+    for name, g, queries in [('lattice', grid_graph(150, 150), 10), ('rail network', london_underground(), 200)]:
+        nodes = g.nodes()
+        pairs = [(random.choice(nodes), random.choice(nodes)) for _ in range(queries)]
+        timings = {}
+        for weights in [None, 'int']:
+            start = time.process_time()
+            distances = [g.shortest_path(n1, n2, weights=weights)[0] for n1, n2 in pairs]
+            timings[weights] = time.process_time() - start, distances
+        assert timings[None][1] == timings['int'][1]
+        print("{} {} queries: heap {:.3f} seconds, bucket queue {:.3f} seconds".format(
+            queries, name, timings[None][0], timings['int'][0]))
+
+
+def test_k_shortest_paths():
+    g = Graph(from_list=[
+        ('C', 'D', 3), ('C', 'E', 2), ('D', 'F', 4), ('E', 'D', 1), ('E', 'F', 2),
+        ('E', 'G', 3), ('F', 'G', 2), ('F', 'H', 1), ('G', 'H', 2),
+    ])  # the example from Yen's algorithm on wikipedia.
+    paths = g.k_shortest_paths('C', 'H', 3)
+    assert paths == [(5, ['C', 'E', 'F', 'H']), (7, ['C', 'E', 'G', 'H']), (8, ['C', 'D', 'F', 'H'])], paths
+    assert len(g.k_shortest_paths('C', 'H', 100)) == 7
+    assert g.k_shortest_paths('H', 'C', 3) == []
+    assert g.k_shortest_paths('C', 'C', 3) == [(0, ['C'])]
+    try:
+        g.k_shortest_paths('C', 'H', 0)
+        raise AssertionError
+    except ValueError:
+        pass
+
+
+def test_k_shortest_paths_brute_force():
+    for g, start, end in [(graph02(), 1, 9), (graph03(), 1, 8), (graph05(), 0, 5)]:
+        everything = sorted(g.distance_from_path(p) for p in g.iter_simple_paths(start, end))
+        paths = g.k_shortest_paths(start, end, 5)
+        for distance, path in paths:
+            assert g.has_path(path) and len(set(path)) == len(path)
+            assert g.distance_from_path(path) == distance
+        assert len({tuple(p) for _, p in paths}) == len(paths)
+        assert [d for d, _ in paths] == everything[:len(paths)], (start, end)
+
+    g = london_underground()
+    paths = g.k_shortest_paths(1, 300, 10)
+    assert paths[0] == g.shortest_path(1, 300)
+    distances = [d for d, _ in paths]
+    assert distances == sorted(distances)
+    assert all(g.has_path(p) and len(set(p)) == len(p) for _, p in paths)
+
+
+def test_k_shortest_paths_on_grid():
+    g = grid_graph(100, 100)
+    start = time.process_time()
+    paths = g.k_shortest_paths((10, 10), (30, 25), 10)
+    end = time.process_time()
+    print("k=10 shortest paths on a grid with {} nodes took {:.3f} seconds".format(len(g.nodes()), end - start))
+    assert len(paths) == 10
+    assert all(d == 35 for d, _ in paths)  # many paths have the manhattan distance.
+    assert len({tuple(p) for _, p in paths}) == 10
+
+
+def test_k_shortest_paths_on_100k_nodes():
+    g = grid_graph(317, 316)  # the size of network in the request.
+    assert len(g.nodes()) > 100000
+    start = time.process_time()
+    paths = g.k_shortest_paths((10, 10), (30, 25), 10)
+    end = time.process_time()
+    print("k=10 shortest paths on a grid with {} nodes took {:.3f} seconds".format(len(g.nodes()), end - start))
+    assert len(paths) == 10
+    assert all(d == 35 and g.distance_from_path(p) == d for d, p in paths)
+    assert len({tuple(p) for _, p in paths}) == 10
+
+
 def test_dfs():
     links = [
         (1, 2, 0),
@@ -349,6 +747,44 @@ def test_dfs_03():
     assert g.has_path(path)
 
 
+def test_dfs_events():
+    g = Graph(from_list=[(1, 2, 1), (2, 3, 1), (3, 1, 1), (1, 4, 1)])
+    events = list(g.dfs_events(1))
+    assert events == [
+        ("discover", None, 1),
+        ("discover", 1, 2),
+        ("discover", 2, 3),
+        ("back_edge", 3, 1),
+        ("finish", 2, 3),
+        ("finish", 1, 2),
+        ("discover", 1, 4),
+        ("finish", 1, 4),
+        ("finish", None, 1),
+    ], events
+
+    events = list(g.dfs_events(1, expand=lambda n: n != 2))
+    assert ("discover", 1, 2) in events
+    assert ("discover", 2, 3) not in events
+
+    g = graph02()  # no cycles.
+    assert not any(event == "back_edge" for event, n1, n2 in g.dfs_events(1))
+
+
+def test_dfs_on_deep_graph():
+    g = Graph(from_list=[(i, i + 1, 1) for i in range(100000)])
+    g.add_edge(100000, 0, 1)
+    lookups = count_lookups(g)
+    start = time.process_time()
+    path = g.depth_first_search(0, 100000)
+    assert lookups() <= 100001  # each node is expanded once, also when backtracking.
+    events = [e for e in g.dfs_events(0) if e[0] == "back_edge"]
+    assert lookups() <= 100001
+    end = time.process_time()
+    print("dfs on chain of 100000 nodes took {:.3f} seconds".format(end - start))
+    assert len(path) == 100001
+    assert events == [("back_edge", 100000, 0)]
+
+
 def test_depth_scan_01():
     links = [
         (1, 2, 0),
@@ -420,6 +856,87 @@ def test_depth_scan_05():
     assert max(result) == 5, result
 
 
+def test_iter_depth_scan():
+    links = [
+        (1, 2, 0),
+        (1, 3, 0),
+        (3, 5, 0),
+        (2, 4, 0),
+        (5, 6, 0),
+    ]
+    g = Graph(from_list=links)
+
+    def visit_node(node) -> bool:
+        return node != 2
+
+    nodes = list(g.iter_depth_scan(1, visit_node))
+    assert nodes[0] == 1
+    assert set(nodes) == {1, 3, 5, 6}
+    assert set(g.iter_depth_scan(1, criteria_batch=lambda ns: [visit_node(n) for n in ns])) == {1, 3, 5, 6}
+    assert list(g.iter_depth_scan(1, lambda n: False)) == []
+
+    g = graph01()
+    for limit in range(1, 6):
+        scanned = set(g.iter_depth_scan(1, lambda n: n < limit))
+        assert scanned == {n for n in g.depth_scan(1, lambda n: n < limit) if n < limit}, limit
+
+
+def test_iter_depth_scan_stops_early():
+    g = grid_graph(100, 100)
+    calls = []
+
+    def criteria(n):
+        calls.append(n)
+        return True
+
+    found = []
+    for n in g.iter_depth_scan((0, 0), criteria):
+        found.append(n)
+        if len(found) == 10:
+            break
+    assert len(calls) < 40, len(calls)  # the scan is lazy, so most of the grid is never evaluated.
+
+
+def test_iter_depth_scan_batches():
+    g = grid_graph(30, 30)
+    batches = []
+
+    def criteria_batch(nodes):
+        batches.append(nodes)
+        return [x + y < 20 for x, y in nodes]
+
+    nodes = list(g.iter_depth_scan((0, 0), criteria_batch=criteria_batch))
+    assert set(nodes) == {(x, y) for x in range(20) for y in range(20) if x + y < 20}
+    evaluated = [n for batch in batches for n in batch]
+    assert len(evaluated) == len(set(evaluated))  # each node is evaluated once.
+    assert len(batches) <= len(nodes) + 1  # one batch per expanded node.
+
+
+def test_iter_depth_scan_errors():
+    g = graph01()
+    for kwargs in [{}, {'criteria': lambda n: True, 'criteria_batch': lambda ns: ns}]:
+        try:
+            g.iter_depth_scan(1, **kwargs)
+            raise AssertionError
+        except ValueError:
+            pass
+    try:
+        g.iter_depth_scan(1, criteria=41)
+        raise AssertionError
+    except TypeError:
+        pass
+    try:
+        g.iter_depth_scan(100, criteria=lambda n: True)
+        raise AssertionError
+    except ValueError:
+        pass
+    try:
+        list(g.iter_depth_scan(1, criteria_batch=lambda ns: [True]))
+        raise AssertionError
+    except ValueError:
+        pass
+
+
 def test_degree_of_separation():
     g = graph05()
     assert g.degree_of_separation(0, 10) == 3
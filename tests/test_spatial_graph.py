@@ -1,3 +1,5 @@
+import random
+import time
 from math import sin, cos, isclose
 from graph import Graph3D
 
@@ -57,6 +59,48 @@ def fishbone_graph(levels=5, lengths=10, depths=2):
     return g
 
 
+def random_mesh_graph(size=20, seed=42):
+    """ Creates a 3D lattice of `size`^3 nodes with randomly displaced
+    coordinates, where 10% of the bidirectional links are removed.
+    Edge values are the distance between the nodes.
+
+    :param size: int: number of nodes along each axis.
+    :param seed: seed for random number generator
+    :return: Graph3D
+    """
+    random.seed(seed)
+    xyz = {}
+    for x in range(size):
+        for y in range(size):
+            for z in range(size):
+                xyz[(x, y, z)] = (x + random.uniform(-0.3, 0.3),
+                                  y + random.uniform(-0.3, 0.3),
+                                  z + random.uniform(-0.3, 0.3))
+    g = Graph3D()
+    for n in xyz.values():
+        g.add_node(n)
+    for (x, y, z), n1 in xyz.items():
+        for step in [(x + 1, y, z), (x, y + 1, z), (x, y, z + 1)]:
+            if step not in xyz or random.random() < 0.1:
+                continue
+            n2 = xyz[step]
+            g.add_edge(n1, n2, g.distance(n1, n2), bidirectional=True)
+    return g, xyz
+
+
+def count_nodes_reached(g, start, end, a_star):
+    """ runs an A* search and returns the number of nodes that received a
+    distance estimate. a_star=False uses a zero estimate (Dijkstra). """
+    reached = set()
+
+    def heuristic(n):
+        reached.add(n)
+        return g.distance(n, end) if a_star else 0
+
+    d, p = g.a_star_search(start, end, heuristic)
+    return d, p, len(reached)
+
+
 def test_basics():
     g = Graph3D()
     a, b, c = (0, 0, 0), (1, 1, 1), (2, 2, 2)
@@ -108,6 +152,59 @@ def test_shortest_path():
     exit_point = (-1, 0, 1)
     d, p = g.shortest_path(entry_point, exit_point)
     assert d == 3, d
+    assert g.shortest_path(entry_point, exit_point, weights='int') == (d, p)
+
+
+def test_a_star():
+    g = spiral_graph()
+    nodes = sorted(g.nodes(), key=lambda x: x[2])
+    d1, p1 = g.shortest_path(nodes[0], nodes[-1])
+    d2, p2 = g.shortest_path(nodes[0], nodes[-1], a_star=True)
+    assert isclose(d1, d2) and p1 == p2
+
+    g = fishbone_graph()
+    entry_point = (-1, 0, 2)
+    exit_point = (-1, 0, 1)
+    d, p = g.shortest_path(entry_point, exit_point, a_star=True)
+    assert d == 3, d
+    assert g.shortest_path(entry_point, (99, 99, 99), a_star=True) == (float('inf'), [])
+    try:
+        g.shortest_path(entry_point, 1, a_star=True)
+        raise AssertionError
+    except TypeError:
+        pass
+
+
+def test_a_star_expands_fewer_nodes():
+    for g, start, end in [
+        (spiral_graph(), (0.0, 1.0, 0.0), (sin(1470 / 150), cos(1470 / 150), 1470 / 150)),
+        (fishbone_graph(), (-1, 0, 2), (10, 2, 5)),
+    ]:
+        d1, p1, dijkstra_count = count_nodes_reached(g, start, end, a_star=False)
+        d2, p2, a_star_count = count_nodes_reached(g, start, end, a_star=True)
+        assert isclose(d1, d2)
+        assert a_star_count <= dijkstra_count
+        print("nodes reached: Dijkstra {}, A* {}".format(dijkstra_count, a_star_count))
+
+    g, xyz = random_mesh_graph(size=30)  # 27,000 nodes.
+    random.seed(5)
+    dijkstra_total, a_star_total = 0, 0
+    dijkstra_time, a_star_time = 0, 0
+    for _ in range(5):
+        start, end = xyz[tuple(random.randrange(30) for _ in range(3))], xyz[tuple(random.randrange(30) for _ in range(3))]
+        t = time.process_time()
+        d1, p1, count = count_nodes_reached(g, start, end, a_star=False)
+        dijkstra_time += time.process_time() - t
+        dijkstra_total += count
+
+        t = time.process_time()
+        d2, p2, count = count_nodes_reached(g, start, end, a_star=True)
+        a_star_time += time.process_time() - t
+        a_star_total += count
+        assert isclose(d1, d2), (d1, d2)
+    print("random mesh, nodes reached: Dijkstra {} ({:.3f} seconds), A* {} ({:.3f} seconds)".format(
+        dijkstra_total, dijkstra_time, a_star_total, a_star_time))
+    assert a_star_total < dijkstra_total
 
 
 def test_no_nearest_neighbour():
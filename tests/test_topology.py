@@ -2,6 +2,7 @@ import time
 from graph import Graph, phase_lines
 from tests import profileit
 from tests.test_graph import graph02, graph_cycle_6, graph_cycle_5, fully_connected_4, mountain_river_map
+from tests.test_search import CountingEdges, count_lookups
 
 
 def test_subgraph():
@@ -48,6 +49,20 @@ def test_is_really_cyclic():
     assert g.has_cycles()
 
 
+def test_has_cycles_witness():
+    g = Graph(from_list=[(1, 2, 1), (2, 3, 1), (3, 4, 1), (4, 2, 1), (5, 5, 1)])
+    cycle = g.has_cycles(witness=True)
+    assert cycle[0] == cycle[-1] and len(cycle) == 4
+    assert all(g.edge(a, b) is not None for a, b in zip(cycle[:-1], cycle[1:]))
+    assert Graph(from_list=[(5, 5, 1)]).has_cycles(witness=True) == [5, 5]
+    assert graph02().has_cycles(witness=True) == []
+
+    g = Graph(from_list=[(n, n + 1, 1) for n in range(100000)])  # a long chain, without recursion.
+    assert not g.has_cycles()
+    g.add_edge(100000, 0, 1)
+    assert len(g.has_cycles(witness=True)) == 100002
+
+
 def test_components():
     g = Graph(from_list=[
         (1, 2, 1),  # component 1
@@ -69,6 +84,39 @@ def test_components():
     assert {10} in components
 
 
+def test_track_components():
+    g = Graph()
+    g.track_components()
+    for n in range(10):
+        g.add_node(n)
+    assert len(g.components()) == 10
+    g.add_edge(1, 2)
+    g.add_edge(3, 2)
+    g.add_edge(11, 12)  # new nodes.
+    assert g.same_component(1, 3)
+    assert not g.same_component(1, 4)
+    assert g.same_component(11, 12)
+    assert len(g.components()) == 9
+    assert {1, 2, 3} in g.components()
+
+    g.del_edge(3, 2)  # the components are rebuilt.
+    assert not g.same_component(1, 3)
+    g.add_edge(3, 1)
+    assert g.same_component(2, 3)
+    g.del_node(1)
+    assert not g.same_component(2, 3)
+    assert sorted(map(sorted, g.components())) == sorted(map(sorted, Graph(from_list=g.to_list()).components()))
+
+    g.track_components(False)
+    g.add_edge(2, 3)
+    assert g.same_component(2, 3)  # without tracking from a fresh disjoint set.
+    try:
+        g.same_component(2, 'missing')
+        raise AssertionError
+    except ValueError:
+        pass
+
+
 def test_network_size():
     g = graph02()
     ns1 = g.network_size(n1=1)
@@ -251,6 +299,52 @@ def test_phaselines_for_ordering():
     assert p == expected, {(k, v) for k, v in p.items()} - {(k, v) for k, v in expected.items()}
 
 
+def test_phase_lines_after_changes():
+    g = Graph(from_list=[(1, 2, 1), (2, 3, 1), (3, 4, 1)])
+    assert g.phase_lines() == {1: 0, 2: 1, 3: 2, 4: 3}
+    g.add_edge(4, 2)  # 2, 3 & 4 become a cycle, entered at 2.
+    assert g.phase_lines() == {1: 0, 2: 1, 3: 2, 4: 3}
+    g.del_edge(1, 2)  # nothing leads into the cycle.
+    try:
+        g.phase_lines()
+        raise AssertionError("The cycle has no entry.")
+    except AttributeError:
+        pass
+    g.add_edge(1, 3)
+    assert g.phase_lines() == {1: 0, 3: 1, 4: 2, 2: 3}
+
+
+def test_phase_lines_for_large_dag():
+    n = 200000
+    g = Graph(from_list=[(i, i + 1, 1) for i in range(n)] + [(i, i + 2, 1) for i in range(0, n, 2)])
+    lookups = count_lookups(g)
+    start = time.time()
+    p = g.phase_lines()
+    end = time.time()
+    print("phase_lines of {} nodes took {:.3f} seconds".format(len(p), end - start))
+    assert p[0] == 0 and p[n] == n
+    assert lookups() <= 3 * len(p)  # a few lookups per node: O(V+E).
+
+
+class CountingItems(CountingEdges):
+    """ CountingEdges that also counts g._edges[n] """
+
+    def __getitem__(self, key):
+        self.lookups += 1
+        return super().__getitem__(key)
+
+
+def test_phase_lines_for_dense_cycle():
+    n = 100
+    g = Graph(from_list=[(a, b, 1) for a in range(n) for b in range(n) if a != b] + [(-1, 0, 1)])
+    g._edges, g._reverse_edges = CountingItems(g._edges), CountingItems(g._reverse_edges)
+    p = g.phase_lines()
+    assert p[-1] == 0 and p[0] == 1
+    assert all(p[i] == 2 for i in range(1, n))
+    # a few lookups per node, not one per edge of the cycle.
+    assert g._edges.lookups + g._reverse_edges.lookups <= 3 * len(p)
+
+
 def test_phaselines_for_larger_graph():
     g = mountain_river_map()
     start = time.time()
@@ -306,3 +400,23 @@ def test_sources():
     s4 = g.sources(7)
     e4 = set()
     assert s4 == e4
+
+
+def test_strongly_connected_components():
+    g = Graph(from_list=[(1, 2, 1), (2, 3, 1), (3, 1, 1), (3, 4, 5), (4, 5, 1), (5, 4, 1), (6, 6, 1), (6, 1, 2), (7,)])
+    components = g.strongly_connected_components()
+    assert sorted(map(sorted, components)) == [[1, 2, 3], [4, 5], [6], [7]]
+    position = {n: i for i, c in enumerate(components) for n in c}
+    for n1, n2, d in g.edges():
+        assert position[n1] <= position[n2]
+
+    dag, members = g.condensation()
+    assert members == position
+    assert not dag.has_cycles()
+    assert dag.node(members[1]) == {1, 2, 3}
+    assert sorted(dag.edges()) == sorted([(members[6], members[1], 2), (members[1], members[4], 5)])
+
+    g = Graph(from_list=[(n, n + 1, 1) for n in range(100000)] + [(100000, 0, 1)])  # no recursion limit.
+    assert len(g.strongly_connected_components()) == 1
+    g = graph02()
+    assert len(g.strongly_connected_components()) == len(g.nodes())
@@ -1,4 +1,5 @@
 from graph import Graph
+from graph.all_pairs import numpy_enabled
 from tests.test_graph import graph02, graph03
 
 
@@ -25,4 +26,72 @@ def test_all_pairs_shortest_path():
 
     g2.add_node(100)
     d = g2.all_pairs_shortest_paths()
-    # should trigger print of isolated node.
\ No newline at end of file
+    # should trigger print of isolated node.
+
+
+def test_adjacency_matrix_values():
+    g = Graph(from_list=[(1, 2, 3), (2, 3, -1), (3, 3, 5)])
+    g.add_node(4)
+    inf = float('inf')
+    assert g.adjacency_matrix() == {
+        1: {1: 0, 2: 3, 3: inf, 4: inf},
+        2: {1: inf, 2: 0, 3: -1, 4: inf},
+        3: {1: inf, 2: inf, 3: 0, 4: inf},
+        4: {1: inf, 2: inf, 3: inf, 4: 0},
+    }
+
+
+def test_to_numpy():
+    g = graph03()
+    if not numpy_enabled:
+        try:
+            g.to_numpy()
+            raise AssertionError
+        except ImportError:
+            return
+    g.add_edge(1, 1, 7)  # self loops are kept on the diagonal.
+    matrix, index = g.to_numpy()
+    assert index == {n: i for i, n in enumerate(g.nodes())}
+    for n1 in g.nodes():
+        for n2 in g.nodes():
+            assert matrix[index[n1], index[n2]] == g.edge(n1, n2, default=float('inf'))
+    assert matrix[index[1], index[1]] == 7
+
+    # the same edges as to_csr.
+    indptr, indices, data = g.to_csr()
+    for i in range(len(index)):
+        for k in range(indptr[i], indptr[i + 1]):
+            assert matrix[i, indices[k]] == data[k]
+    assert (matrix != float('inf')).sum() == len(data)
+
+    nodes = g.nodes()[:3][::-1]
+    matrix, index = g.to_numpy(nodelist=nodes, nonedge=0)
+    assert matrix.shape == (3, 3)
+    for n1 in nodes:
+        for n2 in nodes:
+            assert matrix[index[n1], index[n2]] == g.edge(n1, n2, default=0)
+    try:
+        g.to_numpy(nodelist=[nodes[0], nodes[0]])
+        raise AssertionError
+    except ValueError:
+        pass
+
+
+def test_to_csr():
+    g = graph02()
+    g.add_edge(1, 1, 7)  # self loops are edges in CSR.
+    indptr, indices, data = g.to_csr()
+    nodes = g.nodes()
+    assert len(indptr) == len(nodes) + 1
+    edges = [(nodes[i], nodes[indices[k]], data[k])
+             for i in range(len(nodes)) for k in range(indptr[i], indptr[i + 1])]
+    assert sorted(edges) == sorted(g.edges())
+
+    indptr, indices, data = g.to_csr(nodelist=[2, 1])
+    assert list(indptr) == [0, 0, 2]
+    assert [(indices[k], data[k]) for k in range(2)] == [(0, 1), (1, 7)]
+    try:
+        g.to_csr(nodelist=['missing'])
+        raise AssertionError
+    except ValueError:
+        pass